@@ -20,6 +20,7 @@ from prompt_toolkit.filters.base import Condition
 from prompt_toolkit.keys import Keys
 
 from s3fm.api.fs import File
+from s3fm.api.kb import ALWAYS
 from s3fm.enums import FileType, KBMode
 from s3fm.exceptions import ClientError
 
@@ -27,6 +28,15 @@ if TYPE_CHECKING:
     from s3fm.api.kb import KB_MAPS, KBs
     from s3fm.app import App
 
+# App state that custom effects can depend on, mapped to the plain attribute holding it
+EFFECT_DEPS = {
+    "current_focus": "_current_focus",
+    "current_filepane": "_filepane_focus",
+    "file_pane_focus": "_filepane_focus",
+    "layout": "_layout_mode",
+    "rendered": "_rendered",
+}
+
 
 class HistoryConfig:
     """History config class."""
@@ -43,12 +53,21 @@ class AppConfig:
         self.border = False
         self.padding = 1
         self._custom_effects = []
+        self._effect_deps = {}
         self.cycle = False
+        self.io_threads = 32
 
-    def use_effect(self, func: Callable[["App"], None]) -> Callable[["App"], None]:
+    def use_effect(
+        self,
+        func: Optional[Callable[["App"], None]] = None,
+        deps: Optional[Tuple[str, ...]] = None,
+    ) -> Any:
         """Register custom function to run on :class:`~s3fm.app.App` re-render.
 
-        Works sort of like `useEffect` in React.js. It runs on every UI redraw.
+        Works sort of like `useEffect` in React.js. It runs on every UI redraw
+        unless `deps` is provided, the function then only runs on the first redraw
+        and when any of the listed :class:`~s3fm.app.App` attributes changed.
+        The supported attributes are the keys of :data:`EFFECT_DEPS`.
 
         Warning:
             Running heavy functions will affect the performance significantly as
@@ -64,9 +83,13 @@ class AppConfig:
 
         Args:
             func: A callable to be registered to run on UI redraw.
+            deps: Names of :class:`~s3fm.app.App` attributes the function depends on.
 
         Returns:
-            Original function definition.
+            Original function definition or a decorator when `func` is not provided.
+
+        Raises:
+            ClientError: When a dependency is not in :data:`EFFECT_DEPS`.
 
         Examples:
             >>> from s3fm.api.config import Config
@@ -81,7 +104,20 @@ class AppConfig:
             ...     else:
             ...         # any code to run on every UI redraw
             ...         pass
+            >>> @config.app.use_effect(deps=("current_filepane",))
+            ... def _(app):
+            ...     # only run when the focused filepane changed
+            ...     pass
         """
+        if func is None:
+            return lambda func: self.use_effect(func, deps)
+        if deps is not None:
+            for dep in deps:
+                if dep not in EFFECT_DEPS:
+                    raise ClientError(
+                        "use_effect dependency %s is not supported." % dep
+                    )
+            self._effect_deps[func] = tuple(deps)
         self._custom_effects.append(func)
         return func
 
@@ -90,6 +126,11 @@ class AppConfig:
         """List[Callable[["App"], None]]: Custom effects to run on every render."""
         return self._custom_effects
 
+    @property
+    def effect_deps(self) -> Dict[Callable[["App"], None], Tuple[str, ...]]:
+        """Dict[Callable[["App"], None], Tuple[str, ...]]: Dependencies of the custom effects registered with `deps`."""
+        return self._effect_deps
+
 
 class SpinnerConfig:
     """Spinner config class."""
@@ -430,7 +471,7 @@ class KBConfig:
         action: Union[str, Callable[["App"], None]],
         keys: Union["KBs", List["KBs"]],
         mode: KBMode = KBMode.normal,
-        filter: Callable[[], bool] = lambda: True,
+        filter: Optional[Callable[[], bool]] = None,
         eager: bool = False,
         **kwargs
     ) -> None:
@@ -446,6 +487,7 @@ class KBConfig:
             keys: Keys to map to the action.
             mode: Which mode the keybinding should be operating.
             filter: A callable to enable the keybinding only in certain conditions.
+                If not provided, the keybinding is always enabled.
             eager: Force priority of the keybindings. Meaning if theres already
                 a mapping using a key like `f`, set this flag to overwrite the other
                 duplicated key maps.
@@ -460,12 +502,13 @@ class KBConfig:
             >>> config.kb.map(action=lambda app: app.exit(), keys="c-q")
             >>> config.kb.map(action="cmd_focus", keys=["c-w", ":"])
         """
+        kb_filter = Condition(filter) if filter is not None else ALWAYS
         if isinstance(action, str):
             if action in self._kb_maps[mode]:
                 self._kb_maps[mode][action].append(
                     {
                         "keys": keys,
-                        "filter": Condition(filter),
+                        "filter": kb_filter,
                         "eager": eager,
                         **kwargs,
                     }
@@ -477,7 +520,7 @@ class KBConfig:
                 self._custom_kb_maps[mode][str(action)].append(
                     {
                         "keys": keys,
-                        "filter": Condition(filter),
+                        "filter": kb_filter,
                         "eager": eager,
                         **kwargs,
                     }
@@ -486,7 +529,7 @@ class KBConfig:
                 self._custom_kb_maps[mode][str(action)] = [
                     {
                         "keys": keys,
-                        "filter": Condition(filter),
+                        "filter": kb_filter,
                         "eager": eager,
                         **kwargs,
                     }
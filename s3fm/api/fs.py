@@ -1,10 +1,16 @@
 """Module contains the api class to access/interact with the local file system."""
+
+import asyncio
 import os
+import threading
 from dataclasses import dataclass
+from functools import lru_cache
 from pathlib import Path
-from typing import TYPE_CHECKING, Any, Dict, List, Optional, Union
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple, Union
 
 import boto3
+from botocore.config import Config
+from botocore.exceptions import BotoCoreError, ClientError
 
 from s3fm.enums import FileType
 from s3fm.exceptions import Notification
@@ -12,13 +18,15 @@ from s3fm.utils import human_readable_size, transform_async
 
 if TYPE_CHECKING:
     from mypy_boto3_s3 import S3Client
-    from mypy_boto3_s3.type_defs import (
-        ListBucketsOutputTypeDef,
-        ListObjectsV2OutputTypeDef,
-    )
+
+MAX_POOL_CONNECTIONS = 32
+MAX_PREFETCH = 8
+PREFETCH_TTL = 10
+
+_CLIENT_LOCK = threading.Lock()
 
 
-@dataclass
+@dataclass(init=False)
 class File:
     """Used to store basic file information.
 
@@ -32,17 +40,39 @@ class File:
         name: Name of the file.
         type: FileType.
         info: Additional file information.
-        hidden: Hidden file.
         index: Original file index
         raw: Full path of the file.
+        hidden: Hidden file. Derived from the name when not provided,
+            the ".." parent entry is never hidden.
     """
 
+    __slots__ = ("name", "type", "info", "index", "raw", "hidden")
+
     name: str
     type: FileType
     info: str
-    hidden: bool
     index: int
     raw: Optional[Union[Path, Dict[str, Any]]]
+    hidden: bool
+
+    # written by hand as a field default conflicts with __slots__ before python3.10
+    def __init__(
+        self,
+        name: str,
+        type: FileType,
+        info: str,
+        index: int,
+        raw: Optional[Union[Path, Dict[str, Any]]],
+        hidden: Optional[bool] = None,
+    ) -> None:
+        self.name = name
+        self.type = type
+        self.info = info
+        self.index = index
+        self.raw = raw
+        if hidden is None:
+            hidden = name[:1] == "." and name != ".."
+        self.hidden = hidden
 
 
 class FS:
@@ -93,7 +123,7 @@ class FS:
     async def get_paths(self) -> List[File]:
         """Async wrapper to retrieve all paths/files under :attr:`FS.path`.
 
-        Retrieve a list of files under :obj:`concurrent.futures.ProcessPoolExecutor`.
+        Retrieve a list of files in the event loop's default thread pool executor.
 
         Returns:
             A list of :class:`~s3fm.id.File`.
@@ -116,7 +146,6 @@ class FS:
                 File(
                     name="..",
                     type=FileType.dir,
-                    hidden=False,
                     index=0,
                     info="",
                     raw=None,
@@ -124,21 +153,16 @@ class FS:
             )
         for index, path in enumerate(result):
             file_type = _get_filetype(path)
-            name = str(path.name)
+            name = path.name
+            if file_type == FileType.dir or file_type == FileType.dir_link:
+                name += "/"
             response.append(
                 File(
-                    name="%s%s"
-                    % (
-                        name,
-                        "/"
-                        if file_type == FileType.dir or file_type == FileType.dir_link
-                        else "",
-                    ),
+                    name=name,
                     type=file_type,
                     info=str(human_readable_size(path.stat().st_size))
                     if file_type != FileType.dir
                     else "",
-                    hidden=name.startswith("."),
                     index=index + 1 if str(self._path) != "/" else index,
                     raw=path,
                 )
@@ -156,84 +180,110 @@ class FS:
 
 
 class S3:
-    """Class to provide access and interact with AWS S3."""
+    """Class to provide access and interact with AWS S3.
 
-    def __init__(self) -> None:
-        self._path = Path("")
+    Args:
+        max_pool_connections: Size of the client connection pool, should match
+            the number of threads making concurrent calls with the client.
+    """
+
+    def __init__(self, max_pool_connections: int = MAX_POOL_CONNECTIONS) -> None:
+        self._set_parts(())
         self._region = "ap-southeast-2"
         self._profile = None
+        self._max_pool_connections = max_pool_connections
+        self._prefetched: Dict[
+            Tuple[str, ...], Tuple[float, "asyncio.Future[List[File]]"]
+        ] = {}
 
     @transform_async
-    def _list_buckets(self) -> "ListBucketsOutputTypeDef":
-        """List all buckets in the selected profile and region."""
-        return self.client.list_buckets()
-
-    @transform_async
-    def _list_objects(self) -> "ListObjectsV2OutputTypeDef":
-        """List all objects within selected bucket."""
-        return self.client.list_objects_v2(
-            Bucket=self.bucket_name,
-            Prefix="%s/" % self.bucket_path if self.bucket_path else "",
-            Delimiter="/",
-        )
+    def _get_buckets(self) -> List[File]:
+        """List all buckets in the selected profile and region.
 
-    async def _get_buckets(self) -> List[File]:
-        """Async wrapper to list all buckets.
+        The response is converted in the executor as well.
 
         Returns:
             A list of :class:`~s3fm.id.File`.
         """
-        result = await self._list_buckets()
+        result = self.client.list_buckets()
         return [
             File(
-                name="%s/" % bucket["Name"],
+                name=bucket["Name"] + "/",
                 type=FileType.bucket,
                 info=str(bucket["CreationDate"].replace(tzinfo=None)),
-                hidden=bucket["Name"].startswith("."),
                 index=index,
                 raw=bucket,
             )
             for index, bucket in enumerate(result.get("Buckets", []))
         ]
 
-    async def _get_objects(self, offset: int = 0) -> List[File]:
-        """Async wrapper to list all objects in bucket.
+    @transform_async
+    def _get_objects(self, offset: int = 0) -> List[File]:
+        """List all objects in the current path.
+
+        The response is converted in the executor as well.
 
-        For folders created manually, it will appear as duplicates in the response["Contents"],
-        hence skip them.
+        Args:
+            offset: Index offset to apply to the files.
 
         Returns:
             A list of :class:`~s3fm.id.File`.
         """
-        response = await self._list_objects()
-        result = []
-        dir_count = 0
-        for index, s3_obj in enumerate(response.get("CommonPrefixes", [])):
-            dir_count += 1
-            result.append(
-                File(
-                    name="%s/" % Path(s3_obj["Prefix"]).name,
-                    type=FileType.dir,
-                    info="",
-                    hidden=s3_obj["Prefix"].startswith("."),
-                    index=index + offset,
-                    raw=None,
-                )
-            )
-        for index, s3_obj in enumerate(response.get("Contents", [])):
-            if s3_obj["Key"].endswith("/"):
-                continue
-            result.append(
-                File(
-                    name=Path(s3_obj["Key"]).name,
-                    type=FileType.file,
-                    info=str(human_readable_size(s3_obj["Size"])),
-                    hidden=s3_obj["Key"].startswith("."),
-                    index=index + offset + dir_count,
-                    raw=s3_obj,
-                )
-            )
-        return result
+        return self._list_objects(self._bucket_name, self._prefix, offset)
+
+    def _list_objects(self, bucket_name: str, prefix: str, offset: int) -> List[File]:
+        """List all objects under `prefix` in bucket.
+
+        Pages are requested through the `list_objects_v2` paginator so that
+        prefixes with more than 1000 keys are not truncated.
+
+        Args:
+            bucket_name: Name of the bucket.
+            prefix: Prefix of the objects.
+            offset: Index offset to apply to the files.
+
+        Returns:
+            A list of :class:`~s3fm.id.File`.
+        """
+        prefixes = []
+        contents = []
+        # pages cannot be requested concurrently, the continuation token
+        # of the next page is only known from the response of the previous one
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(
+            Bucket=bucket_name,
+            Prefix=prefix,
+            Delimiter="/",
+        ):
+            prefixes.extend(page.get("CommonPrefixes", []))
+            contents.extend(page.get("Contents", []))
+        return _get_object_files(prefixes, contents, offset)
+
+    def _list_first_page(
+        self, bucket_name: str, prefix: str, offset: int
+    ) -> Optional[List[File]]:
+        """List the objects under `prefix` in bucket with a single request.
+
+        Used by :meth:`S3.prefetch` so that a listing nobody reads costs
+        at most one request.
+
+        Args:
+            bucket_name: Name of the bucket.
+            prefix: Prefix of the objects.
+            offset: Index offset to apply to the files.
+
+        Returns:
+            A list of :class:`~s3fm.id.File` or `None` when the objects
+            do not fit in the first page.
+        """
+        response = self.client.list_objects_v2(
+            Bucket=bucket_name, Prefix=prefix, Delimiter="/"
+        )
+        if response.get("IsTruncated"):
+            return None
+        return _get_object_files(
+            response.get("CommonPrefixes", []), response.get("Contents", []), offset
+        )
 
     async def get_paths(self) -> List[File]:
         """Async wrapper to retrieve list of s3 buckets or objects.
@@ -241,22 +291,86 @@ class S3:
         Retrieve a list of buckets to display or a list of s3 objects
         to display if the bucket is already choosen.
 
+        A listing started by :meth:`S3.prefetch` for the current path is
+        used instead of requesting the objects again, unless it was started
+        more than :data:`PREFETCH_TTL` seconds ago or did not fit in one page.
+
         Returns:
             A list of :class:`~s3fm.id.File`.
         """
-        if str(self._path) == ".":
+        prefetched = self._prefetched.pop(self._parts, None)
+        self._cancel_prefetches()
+        if not self._bucket_name:
             return await self._get_buckets()
-        else:
-            return [
-                File(
-                    name="..",
-                    type=FileType.dir,
-                    hidden=False,
-                    index=0,
-                    info="",
-                    raw=None,
-                )
-            ] + await self._get_objects(offset=1)
+        objects = None
+        if prefetched is not None and _is_fresh(prefetched[0]):
+            try:
+                objects = await prefetched[1]
+            except (BotoCoreError, ClientError):
+                # list again so that the error is raised from the actual navigation
+                pass
+        if objects is None:
+            objects = await self._get_objects(offset=1)
+        return [
+            File(
+                name="..",
+                type=FileType.dir,
+                index=0,
+                info="",
+                raw=None,
+            )
+        ] + objects
+
+    def prefetch(self, path: str, parent: Optional[Path] = None) -> None:
+        """Start listing a directory or bucket in the background.
+
+        The listing runs in the executor and is picked up by :meth:`S3.get_paths`
+        when navigating into `path`, hiding the request latency behind the time
+        spent on the current directory. Only the first page is requested, larger
+        directories are listed in full on navigation.
+
+        Listings that are not used are cancelled on the next navigation and only
+        the latest :data:`MAX_PREFETCH` are kept. A listing older than
+        :data:`PREFETCH_TTL` seconds is started again.
+
+        Args:
+            path: Directory or bucket relative to `parent`.
+            parent: Path that `path` is relative to, defaults to the current path.
+        """
+        parent_parts = self._parts if parent is None else parent.parts
+        parts = parent_parts + tuple(part for part in path.split("/") if part)
+        if not parts:
+            return
+        prefetched = self._prefetched.get(parts)
+        if prefetched is not None and _is_fresh(prefetched[0]):
+            return
+        if prefetched is not None:
+            # a stale listing is replaced and counted as the latest prefetch
+            del self._prefetched[parts]
+            prefetched[1].cancel()
+        loop = asyncio.get_running_loop()
+        bucket_path = "/".join(parts[1:])
+        future = loop.run_in_executor(
+            None,
+            self._list_first_page,
+            parts[0],
+            bucket_path + "/" if bucket_path else "",
+            1,
+        )
+        future.add_done_callback(_discard_exception)
+        self._prefetched[parts] = (loop.time(), future)
+        while len(self._prefetched) > MAX_PREFETCH:
+            _, evicted = self._prefetched.pop(next(iter(self._prefetched)))
+            evicted.cancel()
+
+    def _cancel_prefetches(self) -> None:
+        """Cancel and drop all prefetched listings.
+
+        Listings still queued in the executor are never started.
+        """
+        for _, future in self._prefetched.values():
+            future.cancel()
+        self._prefetched.clear()
 
     async def cd(self, path: str = "", override: bool = False) -> List[File]:
         """Update s3 path or select a bucket if not selected.
@@ -271,45 +385,180 @@ class S3:
             A list of files in the new directory.
         """
         if not path or path == "..":
-            self._path = self._path.parent
+            self._set_parts(self._parts[:-1])
         else:
-            if override:
-                self._path = Path(path)
-            else:
-                self._path = self._path.joinpath(path)
+            parts = tuple(part for part in path.split("/") if part)
+            self._set_parts(parts if override else self._parts + parts)
         return await self.get_paths()
 
+    def _set_parts(self, parts: Tuple[str, ...]) -> None:
+        """Update the current path.
+
+        The path is stored as a tuple of parts so that navigating does
+        not need to create :class:`pathlib.Path` objects. The bucket name
+        and path as well as the uri are derived once here instead of on
+        every access.
+
+        Args:
+            parts: Bucket name followed by the prefix parts.
+        """
+        self._parts = parts
+        self._bucket_name = parts[0] if parts else ""
+        self._bucket_path = "/".join(parts[1:])
+        self._prefix = self._bucket_path + "/" if self._bucket_path else ""
+        self._uri = "s3://" + "/".join(parts)
+
+    def warmup(self) -> None:
+        """Create the shared client ahead of the first request.
+
+        Loading the service model is slow, running this in the executor
+        on startup keeps the cost away from the first listing. AWS errors
+        are ignored here and raised again by the listing itself.
+        """
+        try:
+            self.client
+        except (BotoCoreError, ClientError):
+            pass
+
     @property
     def client(self) -> "S3Client":
-        """S3Client: AWS boto3 client."""
-        session = boto3.Session(region_name=self._region, profile_name=self._profile)
-        client = session.client("s3")
-        return client
+        """S3Client: AWS boto3 client.
+
+        Shared by all :class:`S3` instances with the same region, profile
+        and connection pool size.
+        """
+        return _get_client(self._region, self._profile, self._max_pool_connections)
 
     @property
     def uri(self) -> str:
         """str: Current s3 uri."""
-        return "s3://%s" % ("" if str(self._path) == "." else self._path)
+        return self._uri
 
     @property
     def path(self) -> Path:
         """str: S3 filepath."""
-        return self._path
+        return Path(*self._parts)
 
     @path.setter
     def path(self, value: Path) -> None:
-        self._path = value
+        self._set_parts(value.parts)
 
     @property
     def bucket_name(self) -> str:
         """str: Name of the selected bucket."""
-        if str(self._path) == ".":
-            return ""
-        return self._path.parts[0]
+        return self._bucket_name
 
     @property
     def bucket_path(self) -> str:
         """str: Current s3 path."""
-        if str(self._path) == ".":
-            return ""
-        return "/".join(self._path.parts[1:])
+        return self._bucket_path
+
+
+def _get_object_files(
+    prefixes: List[Dict[str, Any]], contents: List[Dict[str, Any]], offset: int
+) -> List[File]:
+    """Convert a `list_objects_v2` response into files.
+
+    For folders created manually, it will appear as duplicates in the response["Contents"],
+    hence skip them.
+
+    Args:
+        prefixes: The "CommonPrefixes" of the response.
+        contents: The "Contents" of the response.
+        offset: Index offset to apply to the files.
+
+    Returns:
+        A list of :class:`~s3fm.id.File`, directories first.
+    """
+    dirs = [
+        File(
+            name=s3_obj["Prefix"].rstrip("/").rsplit("/", 1)[-1] + "/",
+            type=FileType.dir,
+            info="",
+            index=index,
+            raw=None,
+        )
+        for index, s3_obj in enumerate(prefixes, offset)
+    ]
+    files = [s3_obj for s3_obj in contents if not s3_obj["Key"].endswith("/")]
+    return dirs + [
+        File(
+            name=s3_obj["Key"].rsplit("/", 1)[-1],
+            type=FileType.file,
+            info=str(human_readable_size(s3_obj["Size"])),
+            index=index,
+            raw=s3_obj,
+        )
+        for index, s3_obj in enumerate(files, offset + len(dirs))
+    ]
+
+
+def _is_fresh(started: float) -> bool:
+    """Check if a prefetch is recent enough to be used.
+
+    Args:
+        started: Loop time when the prefetch started.
+
+    Returns:
+        True if the prefetch started less than :data:`PREFETCH_TTL` seconds ago.
+    """
+    return asyncio.get_running_loop().time() - started < PREFETCH_TTL
+
+
+def _discard_exception(future: "asyncio.Future[Any]") -> None:
+    """Retrieve the exception of an unused prefetch.
+
+    Prevents asyncio from logging the exception when the future is dropped.
+
+    Args:
+        future: A finished prefetch.
+    """
+    if not future.cancelled():
+        future.exception()
+
+
+def _get_client(
+    region: str, profile: Optional[str], max_pool_connections: int
+) -> "S3Client":
+    """Get the shared boto3 S3 client.
+
+    Both file panes can request the client at the same time from the
+    executor on startup, the lock prevents creating it twice.
+
+    Args:
+        region: AWS region of the client.
+        profile: AWS profile to use.
+        max_pool_connections: Size of the client connection pool.
+
+    Returns:
+        The boto3 S3 client.
+    """
+    with _CLIENT_LOCK:
+        return _create_client(region, profile, max_pool_connections)
+
+
+@lru_cache(maxsize=None)
+def _create_client(
+    region: str, profile: Optional[str], max_pool_connections: int
+) -> "S3Client":
+    """Create the boto3 S3 client.
+
+    Cached so that the session and client are only created once, boto3
+    clients are thread safe and can be shared between the file panes.
+
+    The connection pool is sized by the caller, :class:`~s3fm.app.App`
+    passes :attr:`s3fm.api.config.AppConfig.io_threads` so that concurrent
+    calls from the executor do not discard pooled connections.
+
+    Args:
+        region: AWS region of the client.
+        profile: AWS profile to use.
+        max_pool_connections: Size of the client connection pool.
+
+    Returns:
+        The boto3 S3 client.
+    """
+    session = boto3.Session(region_name=region, profile_name=profile)
+    return session.client(
+        "s3", config=Config(max_pool_connections=max_pool_connections)
+    )
@@ -2,46 +2,97 @@
 
 Used to store and retrieve the state of the :class:`~s3fm.app.App`.
 """
+import hashlib
 import json
 import os
 import sys
-from collections import OrderedDict
 from pathlib import Path
-from typing import Any, Iterator, Tuple
+from typing import Any, Dict, ItemsView, Iterator, KeysView, Optional, Tuple
 
 from s3fm.enums import LayoutMode, Pane, PaneMode
 from s3fm.utils import transform_async
 
 __all__ = ["History"]
 
+_IS_POSIX = sys.platform.startswith(("darwin", "linux"))
 
-class Directory(OrderedDict):
-    """Custom :class:`collections.OrderedDict` with size limit.
+_HISTORY_ATTRS = (
+    "_layout",
+    "_left_mode",
+    "_left_path",
+    "_left_index",
+    "_right_mode",
+    "_right_path",
+    "_right_index",
+    "_focus",
+    "_dir_max_size",
+    "_cmd_max_size",
+    "_directory",
+    "_cmd",
+)
 
-    Used to store directory history.
+
+class Directory:
+    """Dictionary with size limit.
+
+    Used to store directory history. Setting a key moves it to the end
+    and the oldest entries are evicted once the size limit is exceeded.
 
     Args:
+        data: Initial directory history.
         size_limit: The max size of the dict.
-
-    Reference:
-        https://stackoverflow.com/a/2437645
     """
 
-    def __init__(self, *args, **kwargs) -> None:
-        self._size_limit = kwargs.pop("size_limit")
-        super().__init__(*args, **kwargs)
+    __slots__ = ("_data", "_size_limit")
+
+    def __init__(
+        self, data: Optional[Dict[str, int]] = None, size_limit: Optional[int] = None
+    ) -> None:
+        self._data = dict(data or {})
+        self._size_limit = size_limit
         self._check_size_limit()
 
-    def __setitem__(self, key, value) -> None:
-        if key in self:
-            self.move_to_end(key, last=True)
-        super().__setitem__(key, value)
+    def __setitem__(self, key: str, value: int) -> None:
+        data = self._data
+        if key in data:
+            del data[key]
+        data[key] = value
         self._check_size_limit()
 
+    def __getitem__(self, key: str) -> int:
+        return self._data[key]
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._data
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._data)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, Directory):
+            return self._data == other._data
+        return self._data == other
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Get the value of `key` if present, else `default`."""
+        return self._data.get(key, default)
+
+    def keys(self) -> KeysView[str]:
+        """Keys in least recently set order."""
+        return self._data.keys()
+
+    def items(self) -> ItemsView[str, int]:
+        """Items in least recently set order."""
+        return self._data.items()
+
     def _check_size_limit(self) -> None:
         if self._size_limit is not None:
-            while len(self) > self._size_limit:
-                self.popitem(last=False)
+            data = self._data
+            while len(data) > self._size_limit:
+                del data[next(iter(data))]
 
 
 class History:
@@ -51,6 +102,8 @@ class History:
     into history files on application exit.
     """
 
+    __slots__ = _HISTORY_ATTRS + ("_digest", "_hist_file")
+
     def __init__(self, dir_max_size=500, cmd_max_size=500) -> None:
         self._layout = LayoutMode.vertical
         self._left_mode = PaneMode.s3
@@ -64,30 +117,69 @@ class History:
         self._cmd_max_size = cmd_max_size
         self._directory = Directory(size_limit=self._dir_max_size or 500)
         self._cmd = []
+        self._digest: Optional[bytes] = None
+        self._hist_file: Optional[Path] = None
 
     @transform_async
-    def read(self) -> None:
-        """Read history."""
-        if not self.hist_file.exists():
+    def _load(self) -> Optional[Tuple[bytes, Dict[str, Any]]]:
+        """Load and parse the history file.
+
+        Returns:
+            The digest of the file content and the parsed history
+            or `None` when there is no history file.
+        """
+        try:
+            content = self.hist_file.read_bytes()
+        except FileNotFoundError:
+            return None
+        return _get_digest(content), json.loads(content)
+
+    async def read(self) -> None:
+        """Read history.
+
+        Only the file access and parsing are offloaded to the executor,
+        the history state itself is updated on the event loop.
+        """
+        loaded = await self._load()
+        if loaded is None:
             return
-        attrs = dict(self)
-        with self.hist_file.open("r") as file:
-            result = json.load(file)
-            for key, value in result.items():
-                if key == "_directory":
-                    self._directory = Directory(value, size_limit=self._dir_max_size)
-                elif key in attrs:
-                    setattr(self, key, value)
+        self._digest, result = loaded
+        for key, value in result.items():
+            if key == "_directory":
+                self._directory = Directory(value, size_limit=self._dir_max_size)
+            elif key in _HISTORY_ATTRS:
+                setattr(self, key, value)
 
     def write(self) -> None:
-        """Write history."""
-        with self.hist_file.open("w") as file:
-            json.dump(dict(self), file, indent=4)
+        """Write history.
+
+        The history is written to a temporary file first and then moved
+        over the history file so that a crash mid-write cannot truncate it.
+
+        Writing is skipped when the content is identical to what was last
+        read or written.
+        """
+        state = {attr: getattr(self, attr) for attr in _HISTORY_ATTRS}
+        content = json.dumps(state, indent=4, default=dict).encode()
+        digest = _get_digest(content)
+        if digest == self._digest:
+            return
+        hist_file = self.hist_file
+        tmp_file = hist_file.with_suffix(".json.tmp")
+        fd = os.open(tmp_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        try:
+            view = memoryview(content)
+            while view:
+                view = view[os.write(fd, view) :]
+        finally:
+            os.close(fd)
+        os.replace(tmp_file, hist_file)
+        self._digest = digest
 
     def __iter__(self) -> Iterator[Tuple[str, Any]]:
         """Override __iter__ to allow dict representation."""
-        for attr, value in self.__dict__.items():
-            yield attr, value
+        for attr in _HISTORY_ATTRS:
+            yield attr, getattr(self, attr)
 
     @property
     def focus(self) -> Pane:
@@ -163,14 +255,40 @@ class History:
 
     @property
     def hist_file(self) -> Path:
-        """:class:`pathlib.Path`: History file."""
-        if sys.platform.startswith("darwin") or sys.platform.startswith("linux"):
-            base_dir = os.getenv("XDG_DATA_HOME", "~/.local/share")
-            hist_dir = Path("%s/s3fm" % base_dir).expanduser()
-        else:
-            # TODO: get windows config
-            base_dir = os.getenv("APPDATA")
-            hist_dir = Path("%s\\s3fm\\history" % base_dir).expanduser()
-        if not hist_dir.exists():
-            hist_dir.mkdir(parents=True)
-        return hist_dir.joinpath("history.json")
+        """:class:`pathlib.Path`: History file.
+
+        Resolved on first access so that the directory lookup and creation
+        only happen once per :class:`History`.
+        """
+        if self._hist_file is None:
+            self._hist_file = _get_hist_file()
+        return self._hist_file
+
+
+def _get_digest(content: bytes) -> bytes:
+    """Get the digest of the history content.
+
+    Args:
+        content: Serialized history.
+
+    Returns:
+        Digest used to detect unchanged history.
+    """
+    return hashlib.blake2b(content, digest_size=16).digest()
+
+
+def _get_hist_file() -> Path:
+    """Resolve the history file location and create its parent directory.
+
+    Returns:
+        Path to the history file.
+    """
+    if _IS_POSIX:
+        base_dir = os.getenv("XDG_DATA_HOME", "~/.local/share")
+        hist_dir = Path(os.path.expanduser(base_dir)) / "s3fm"
+    else:
+        # TODO: get windows config
+        base_dir = os.getenv("APPDATA", "")
+        hist_dir = Path(os.path.expanduser(base_dir)) / "s3fm" / "history"
+    hist_dir.mkdir(parents=True, exist_ok=True)
+    return hist_dir.joinpath("history.json")
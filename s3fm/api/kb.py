@@ -1,8 +1,10 @@
 """Module contains the modified :class:`prompt_toolkit.key_binding.KeyBindings` class."""
+
 import inspect
-from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Union
+from functools import partial
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple, Union
 
-from prompt_toolkit.filters.base import Condition
+from prompt_toolkit.filters.base import Always, Condition, Filter
 from prompt_toolkit.key_binding.key_bindings import KeyBindings, KeyHandlerCallable
 from prompt_toolkit.key_binding.key_processor import KeyPressEvent
 from prompt_toolkit.keys import Keys
@@ -15,6 +17,103 @@ if TYPE_CHECKING:
 KBs = Union[Keys, str]
 KB_MAPS = Dict[str, List[Dict[str, Union[bool, KBs, Condition, List[KBs]]]]]
 
+KB_BINDING = Tuple[KBMode, str, Tuple[KBs, ...], Filter, bool]
+KB_ACTION = Tuple[KBMode, str, str, Tuple[Any, ...]]
+
+MAX_ACTION_MULTIPLIER = 9999
+
+_DIGITS = {str(digit): digit for digit in range(10)}
+
+SWAP_LAYOUT = {
+    Direction.up: LayoutMode.horizontal,
+    Direction.down: LayoutMode.horizontal,
+    Direction.left: LayoutMode.vertical,
+    Direction.right: LayoutMode.vertical,
+}
+
+ALWAYS = Always()
+
+
+def _flatten_kb_maps(kb_maps: Dict[KBMode, KB_MAPS]) -> Tuple[KB_BINDING, ...]:
+    """Flatten keybinding mappings into a tuple of bindings.
+
+    Args:
+        kb_maps: Keybinding mappings such as :attr:`s3fm.api.config.KBConfig.kb_maps`.
+
+    Returns:
+        A tuple of `(mode, action, keys, filter, eager)` where keys are always a tuple
+        and the missing options are filled with their defaults.
+    """
+    bindings = []
+    for mode, maps in kb_maps.items():
+        for action, binds in maps.items():
+            for bind in binds:
+                keys = bind["keys"]
+                bindings.append(
+                    (
+                        mode,
+                        action,
+                        tuple(keys) if isinstance(keys, list) else (keys,),
+                        bind.get("filter", ALWAYS),
+                        bind.get("eager", False),
+                    )
+                )
+    return tuple(bindings)
+
+
+def _bind_actions(
+    target: Any, actions: Tuple[KB_ACTION, ...]
+) -> Dict[Tuple[KBMode, str], Callable[[], Any]]:
+    """Resolve action templates into callables bound to `target`.
+
+    Args:
+        target: Object to look up the action attributes on.
+        actions: Tuple of `(mode, action, attribute, args)`.
+
+    Returns:
+        A lookup of `(mode, action)` to the callable, pre-bound with
+        :func:`functools.partial` when the action has args.
+    """
+    return {
+        (mode, action): (
+            partial(getattr(target, attr), *args) if args else getattr(target, attr)
+        )
+        for mode, action, attr, args in actions
+    }
+
+
+def _discard_event(func: Callable[[], Any]) -> KeyHandlerCallable:
+    """Wrap an action that does not take the `KeyPressEvent`.
+
+    The wrapper is chosen once at bind time so that the key press only
+    has to forward the call.
+
+    Args:
+        func: Action to wrap.
+
+    Returns:
+        A coroutine function when `func` is one, otherwise a plain function.
+    """
+    # python3.7 does not look through partial when checking for coroutines
+    target = func
+    while isinstance(target, partial):
+        target = target.func
+    if inspect.iscoroutinefunction(target):
+
+        async def async_handler(_: KeyPressEvent) -> None:
+            await func()
+
+        return async_handler
+
+    def handler(_: KeyPressEvent) -> None:
+        func()
+
+    return handler
+
+
+def _ignore_key(_: KeyPressEvent) -> None:
+    """Consume a key press without doing anything."""
+
 
 class KB(KeyBindings):
     """Modified :class:`prompt_toolkit.key_binding.KeyBindings` class to apply custom decorator logic.
@@ -27,6 +126,57 @@ class KB(KeyBindings):
         custom_kb_lookup: The :attr:`s3fm.api.config.KBConfig.custom_kb_lookup` in config class.
     """
 
+    # (mode, action, attribute, args) resolved against the app and KB instances
+    _APP_ACTIONS: Tuple[KB_ACTION, ...] = (
+        (KBMode.normal, "exit", "exit", ()),
+        (KBMode.normal, "layout_vertical", "layout_switch", (LayoutMode.vertical,)),
+        (KBMode.normal, "layout_horizontal", "layout_switch", (LayoutMode.horizontal,)),
+        (KBMode.normal, "layout_single", "layout_switch", (LayoutMode.single,)),
+        (KBMode.normal, "cmd_focus", "cmd_focus", ()),
+        (KBMode.normal, "cmd_focus_search", "cmd_focus", (CommandMode.search,)),
+        (
+            KBMode.normal,
+            "cmd_focus_reverse_search",
+            "cmd_focus",
+            (CommandMode.reverse_search,),
+        ),
+        (KBMode.normal, "pane_focus", "pane_focus_other", ()),
+        *(
+            (
+                KBMode.normal,
+                "pane_swap_%s" % direction.name,
+                "pane_swap",
+                (direction, layout),
+            )
+            for direction, layout in SWAP_LAYOUT.items()
+        ),
+        (KBMode.command, "exit", "cmd_exit", ()),
+        (KBMode.error, "exit", "set_error", ()),
+        (KBMode.search, "exit", "cmd_exit", ()),
+        (KBMode.reverse_search, "exit", "cmd_exit", ()),
+    )
+    _KB_ACTIONS: Tuple[KB_ACTION, ...] = (
+        (KBMode.normal, "pane_scroll_down", "_pane_scroll_down", ()),
+        (KBMode.normal, "pane_scroll_up", "_pane_scroll_up", ()),
+        (KBMode.normal, "pane_scroll_down_page", "_pane_scroll_down", (1, True)),
+        (KBMode.normal, "pane_scroll_up_page", "_pane_scroll_up", (1, True)),
+        (KBMode.normal, "pane_scroll_bottom", "_pane_scroll_down", (1, False, True)),
+        (KBMode.normal, "pane_scroll_top", "_pane_scroll_up", (1, False, True)),
+        (KBMode.normal, "pane_page_up", "_pane_page_up", ()),
+        (KBMode.normal, "pane_page_down", "_pane_page_down", ()),
+        (KBMode.normal, "pane_forward", "_pane_forward", ()),
+        (KBMode.normal, "pane_backword", "_pane_backword", ()),
+        (KBMode.normal, "pane_toggle_hidden_files", "_pane_toggle_hidden_files", ()),
+        (
+            KBMode.normal,
+            "pane_set_action_multiplier",
+            "_pane_set_action_multiplier",
+            (),
+        ),
+        (KBMode.normal, "pane_switch_mode", "_pane_switch_mode", ()),
+        (KBMode.search, "confirm", "_cmd_search_confirm", ()),
+    )
+
     def __init__(
         self,
         app: "App",
@@ -37,166 +187,66 @@ class KB(KeyBindings):
         self._activated = False
         self._app = app
         self._action_multiplier = None
+        # keypresses are not matched until the keybinding is activated
+        activated = Condition(lambda: self._activated)
         self._mode = {
-            KBMode.normal: self._app.normal_mode,
-            KBMode.command: self._app.command_mode,
-            KBMode.error: self._app.error_mode,
-            KBMode.search: self._app.search_mode,
-            KBMode.reverse_search: self._app.reverse_search_mode,
-        }
-        self._kb_maps = kb_maps or {
-            KBMode.normal: {},
-            KBMode.command: {},
-            KBMode.error: {},
-            KBMode.search: {},
-            KBMode.reverse_search: {},
-        }
-        self._kb_lookup = {
-            KBMode.normal: {
-                "exit": self._app.exit,
-                "layout_vertical": {
-                    "func": self._app.layout_switch,
-                    "args": [LayoutMode.vertical],
-                },
-                "layout_horizontal": {
-                    "func": self._app.layout_switch,
-                    "args": [LayoutMode.horizontal],
-                },
-                "layout_single": {
-                    "func": self._app.layout_switch,
-                    "args": [LayoutMode.single],
-                },
-                "cmd_focus": self._app.cmd_focus,
-                "cmd_focus_search": {
-                    "func": self._app.cmd_focus,
-                    "args": [CommandMode.search],
-                },
-                "cmd_focus_reverse_search": {
-                    "func": self._app.cmd_focus,
-                    "args": [CommandMode.reverse_search],
-                },
-                "pane_focus": self._app.pane_focus_other,
-                "pane_swap_down": {"func": self._swap_pane, "args": [Direction.down]},
-                "pane_swap_up": {"func": self._swap_pane, "args": [Direction.up]},
-                "pane_swap_left": {"func": self._swap_pane, "args": [Direction.left]},
-                "pane_swap_right": {"func": self._swap_pane, "args": [Direction.right]},
-                "pane_scroll_down": self._pane_scroll_down,
-                "pane_scroll_up": self._pane_scroll_up,
-                "pane_scroll_down_page": {
-                    "func": self._pane_scroll_down,
-                    "args": [1, True],
-                },
-                "pane_scroll_up_page": {
-                    "func": self._pane_scroll_up,
-                    "args": [1, True],
-                },
-                "pane_scroll_bottom": {
-                    "func": self._pane_scroll_down,
-                    "args": [1, False, True],
-                },
-                "pane_scroll_top": {
-                    "func": self._pane_scroll_up,
-                    "args": [1, False, True],
-                },
-                "pane_page_up": self._pane_page_up,
-                "pane_page_down": self._pane_page_down,
-                "pane_forward": self._pane_forward,
-                "pane_backword": self._pane_backword,
-                "pane_toggle_hidden_files": self._pane_toggle_hidden_files,
-                "pane_set_action_multiplier": self._pane_set_action_multiplier,
-                "pane_switch_mode": self._pane_switch_mode,
-            },
-            KBMode.command: {"exit": self._app.cmd_exit},
-            KBMode.error: {"exit": self._app.set_error},
-            KBMode.search: {
-                "exit": self._app.cmd_exit,
-                "confirm": self._cmd_search_confirm,
-            },
-            KBMode.reverse_search: {"exit": self._app.cmd_exit},
+            mode: activated & getattr(self._app, "%s_mode" % mode.name)
+            for mode in KBMode
         }
+        self._kb_maps = kb_maps or {mode: {} for mode in KBMode}
         self._custom_kb_maps = custom_kb_maps or {
             KBMode.normal: {},
             KBMode.command: {},
         }
-        self._custom_kb_lookup = custom_kb_lookup or {
-            KBMode.normal: {},
-            KBMode.command: {},
+        custom_actions = {
+            (mode, action): partial(func, self._app)
+            for mode, lookup in (custom_kb_lookup or {}).items()
+            for action, func in lookup.items()
+        }
+        # builtin and custom actions share one lookup resolved at bind time
+        self._kb_lookup = {
+            **_bind_actions(self._app, self._APP_ACTIONS),
+            **_bind_actions(self, self._KB_ACTIONS),
+            **custom_actions,
         }
         super().__init__()
 
-        self._create_bindings(KBMode.error, custom=False)
-        self._create_bindings(KBMode.normal, custom=False)
-        self._create_bindings(KBMode.command, custom=False)
-        self._create_bindings(KBMode.search, custom=False)
-        self._create_bindings(KBMode.reverse_search, custom=False)
-
-        self._create_bindings(KBMode.normal, custom=True)
-        self._create_bindings(KBMode.command, custom=True)
-
-        for i in range(10):
-            self._factory(
-                action="pane_set_action_multiplier",
-                mode=KBMode.normal,
-                custom=False,
-                raw=True,
-                keys=str(i),
-            )
+        bindings = _flatten_kb_maps(self._kb_maps)
+        if custom_actions:
+            bindings += _flatten_kb_maps(self._custom_kb_maps)
+        self._create_bindings(bindings)
 
-    def _create_bindings(self, mode: KBMode, custom: bool = False) -> None:
-        """Create keybindings.
+        # bound keys are consumed while deactivated instead of being passed on
+        deactivated = ~activated
+        for keys in dict.fromkeys(
+            [binding[2] for binding in bindings] + [(digit,) for digit in _DIGITS]
+        ):
+            super().add(*keys, filter=deactivated)(_ignore_key)
 
-        Interal function to create all keybindings in `kb_maps` and `custom_kb_maps`.
+        digit_handler = self._get_handler(self._pane_set_action_multiplier, raw=True)
+        digit_filter = self._get_filter(KBMode.normal)
+        for digit in _DIGITS:
+            super().add(digit, filter=digit_filter)(digit_handler)
 
-        Args:
-            mode: Indicate which mode to create the kb.
-            custom: Indicate if its custom kb.
-        """
-        target_maps = self._kb_maps if not custom else self._custom_kb_maps
-        for action, binds in target_maps[mode].items():
-            for bind in binds:
-                self._factory(action=action, mode=mode, custom=custom, **bind)  # type: ignore
-
-    def _factory(
-        self,
-        action: str,
-        mode: KBMode,
-        custom: bool,
-        keys: Union[List[Union[Keys, str]], Union[Keys, str]],
-        raw: bool = False,
-        filter: Condition = Condition(lambda: True),
-        eager: bool = False,
-        **kwargs,
-    ) -> None:
-        """Call `add` to create bindings.
+    def _create_bindings(self, bindings: Tuple[KB_BINDING, ...]) -> None:
+        """Create keybindings.
 
-        Internal factory function to create keybindings in a loop.
+        Interal function to create all keybindings in `kb_maps` and `custom_kb_maps`.
+        Keys bound to the same action share a single handler.
 
         Args:
-            action: The action to apply keybinding.
-            mode: Which mode to bind this function.
-            custom: Flag indicate if its custom function.
-            raw: Use the raw `KeyPressEvent` as the argument.
-            keys: List of keys to bind to the function.
-            filter: Enable the keybinding only if filter condition is satisfied.
-            eager: Force priority on this keybinding.
-            **kwargs: Additional args to provide to the :meth:`prompt_toolkit.key_binding.KeyBindings.add`.
+            bindings: Flattened keybindings created by :func:`_flatten_kb_maps`.
         """
-        if not isinstance(keys, list):
-            keys = [keys]
-        target_lookup = self._kb_lookup if not custom else self._custom_kb_lookup
-        key_action = target_lookup[mode][action]
-        if not isinstance(key_action, dict):
-            key_action = {"func": key_action}
-        function_args = key_action.get("args", [])
-        if custom:
-            function_args = [self._app]
-
-        @self.add(*keys, filter=filter, eager=eager, mode=mode, raw=raw, **kwargs)
-        async def _(event: KeyPressEvent) -> None:
-            if inspect.iscoroutinefunction(key_action["func"]):
-                await key_action["func"](*function_args if not raw else [event])
-            else:
-                key_action["func"](*function_args if not raw else [event])
+        handlers: Dict[Tuple[KBMode, str], KeyHandlerCallable] = {}
+        for mode, action, keys, filter, eager in bindings:
+            handler = handlers.get((mode, action))
+            if handler is None:
+                handler = handlers[mode, action] = self._get_handler(
+                    _discard_event(self._kb_lookup[mode, action])
+                )
+            super().add(*keys, filter=self._get_filter(mode, filter), eager=eager)(
+                handler
+            )
 
     def _pane_set_action_multiplier(self, event: KeyPressEvent) -> None:
         """Set action multiplier.
@@ -204,11 +254,10 @@ class KB(KeyBindings):
         Args:
             event: A `prompt_toolkit.key_binding.key_processor.KeyPressEvent` instance.
         """
-        key_num = event.key_sequence[0].key
-        if not self._action_multiplier:
-            self._action_multiplier = int(key_num)
-        else:
-            self._action_multiplier = int("%s%s" % (self._action_multiplier, key_num))
+        self._action_multiplier = min(
+            (self._action_multiplier or 0) * 10 + _DIGITS[event.key_sequence[0].key],
+            MAX_ACTION_MULTIPLIER,
+        )
 
     def _pane_page_up(self) -> None:
         """Scroll page up."""
@@ -226,17 +275,6 @@ class KB(KeyBindings):
         """Perform backword action."""
         await self._app.current_filepane.backword()
 
-    def _swap_pane(self, direction: Direction) -> None:
-        """Move current pane to bottom split.
-
-        Args:
-            direction: Swap direction.
-        """
-        if direction == Direction.down or direction == Direction.up:
-            self._app.pane_swap(direction, layout=LayoutMode.horizontal)
-        else:
-            self._app.pane_swap(direction, layout=LayoutMode.vertical)
-
     def _pane_scroll_down(
         self,
         value: int = 1,
@@ -248,8 +286,7 @@ class KB(KeyBindings):
         Reference:
             :meth:`~s3fm.ui.filepane.FilePane.scroll_down`
         """
-        if self.action_multiplier:
-            value = self.action_multiplier
+        value = self._action_multiplier or value
         self._app.current_filepane.scroll_down(value=value, page=page, bottom=bottom)
 
     def _pane_scroll_up(
@@ -260,8 +297,7 @@ class KB(KeyBindings):
         Reference:
             :meth:`~s3fm.ui.filepane.FilePane.scroll_up`
         """
-        if self.action_multiplier:
-            value = self.action_multiplier
+        value = self._action_multiplier or value
         self._app.current_filepane.scroll_up(value=value, page=page, top=top)
 
     async def _pane_toggle_hidden_files(self) -> None:
@@ -279,7 +315,7 @@ class KB(KeyBindings):
     def add(
         self,
         *keys: Union[Keys, str],
-        filter: Condition = Condition(lambda: True),
+        filter: Filter = ALWAYS,
         eager: bool = False,
         mode: KBMode = KBMode.normal,
         raw: bool = False,
@@ -322,24 +358,63 @@ class KB(KeyBindings):
             ...             app.exit()
         """
         super_dec = super().add(
-            *keys, filter=filter & self._mode[mode], eager=eager, **kwargs
+            *keys, filter=self._get_filter(mode, filter), eager=eager, **kwargs
         )
 
         def decorator(func: KeyHandlerCallable) -> KeyHandlerCallable:
-            @super_dec
-            async def executable(event) -> None:
-                if not self._activated:
-                    return
-                if inspect.iscoroutinefunction(func):
-                    await func(event)  # type: ignore
-                else:
-                    func(event)
-                if not raw:
+            return super_dec(self._get_handler(func, raw))
+
+        return decorator
+
+    def _get_filter(self, mode: KBMode, filter: Filter = ALWAYS) -> Filter:
+        """Get the filter of a keybinding.
+
+        Args:
+            mode: Which mode the keybinding is in.
+            filter: Additional filter of the keybinding.
+
+        Returns:
+            Filter combining activation, mode and the additional filter.
+        """
+        mode_filter = self._mode[mode]
+        if filter is not ALWAYS:
+            # evaluate the mode first so user filters only run within the mode
+            mode_filter = mode_filter & filter
+        return mode_filter
+
+    def _get_handler(
+        self, func: KeyHandlerCallable, raw: bool = False
+    ) -> KeyHandlerCallable:
+        """Wrap the function to reset the action multiplier after it runs.
+
+        Args:
+            func: Function to wrap.
+            raw: Keep the action multiplier, used for number keybinding.
+
+        Returns:
+            The handler to register in :class:`prompt_toolkit.key_binding.KeyBindings`.
+        """
+        if raw:
+            # nothing to do after a raw function, register it as is
+            return func
+
+        # synchronous handlers are run inline by prompt_toolkit while
+        # coroutines are scheduled as a background task on every key press
+        if inspect.iscoroutinefunction(func):
+
+            async def async_executable(event) -> None:
+                await func(event)  # type: ignore
+                if self._action_multiplier is not None:
                     self._action_multiplier = None
 
-            return executable
+            return async_executable
 
-        return decorator
+        def executable(event) -> None:
+            func(event)
+            if self._action_multiplier is not None:
+                self._action_multiplier = None
+
+        return executable
 
     @property
     def activated(self) -> bool:
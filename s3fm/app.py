@@ -7,7 +7,10 @@ However, it's recommended to import the :class:`App` for type hinting purposes w
 using the :class:`~s3fm.api.config.Config`.
 """
 import asyncio
-from typing import TYPE_CHECKING, Dict, Optional
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any, Dict, Optional, Tuple
 
 from prompt_toolkit.application import Application
 from prompt_toolkit.filters.base import Condition
@@ -16,7 +19,8 @@ from prompt_toolkit.layout.layout import Layout
 from prompt_toolkit.styles import Style
 from prompt_toolkit.widgets.base import Frame
 
-from s3fm.api.config import Config
+from s3fm.api.config import EFFECT_DEPS, Config
+from s3fm.api.fs import S3
 from s3fm.api.history import History
 from s3fm.api.kb import KB
 from s3fm.enums import CommandMode, Direction, ErrorType, KBMode, LayoutMode, Pane
@@ -29,6 +33,41 @@ from s3fm.ui.optionpane import OptionPane
 if TYPE_CHECKING:
     from prompt_toolkit.layout.containers import Container
 
+REDRAW_INTERVAL = 1 / 60
+
+_CANCEL_FUTURES = sys.version_info >= (3, 9)
+
+_KB_MODE_MAP = {
+    CommandMode.command: KBMode.command,
+    CommandMode.search: KBMode.search,
+    CommandMode.reverse_search: KBMode.reverse_search,
+}
+
+_LAYOUT_VERTICAL = {
+    LayoutMode.vertical: True,
+    LayoutMode.horizontal: False,
+    LayoutMode.single: False,
+}
+
+_SWAP_NOOP, _SWAP_FOCUS, _SWAP_PANES = range(3)
+_SWAP_TOWARDS = {
+    (Pane.left, Direction.left),
+    (Pane.left, Direction.up),
+    (Pane.right, Direction.right),
+    (Pane.right, Direction.down),
+}
+_SWAP_TABLE = {
+    (focus, direction, current, target): (
+        (_SWAP_NOOP if current == target else _SWAP_FOCUS)
+        if (focus, direction) in _SWAP_TOWARDS
+        else _SWAP_PANES
+    )
+    for focus in (Pane.left, Pane.right)
+    for direction in Direction
+    for current in LayoutMode
+    for target in LayoutMode
+}
+
 
 class App:
     """Main app class to render the UI and run the application.
@@ -48,28 +87,35 @@ class App:
 
     def __init__(self, config: Config = None, no_history: bool = False) -> None:
         config = config or Config()
-        self._style = Style.from_dict(dict(config.style))
+        self._style = _get_style(tuple(config.style))
         self._rendered = False
         self._no_history = no_history
         self._layout_mode = LayoutMode.vertical
         self._border = config.app.border
+        self._io_threads = config.app.io_threads
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._warmup: Optional["asyncio.Future[None]"] = None
         self._current_focus = Pane.left
         self._previous_focus = None
         self._filepane_focus = Pane.left
-        self._custom_effects = config.app.custom_effects
+        effect_deps = config.app.effect_deps
+        self._custom_effects = tuple(
+            (func, _get_effect_attrs(effect_deps.get(func)))
+            for func in config.app.custom_effects
+        )
+        self._effect_snapshots: Dict[int, Tuple[Any, ...]] = {}
         self._history = History(
             dir_max_size=config.history.dir_max_size,
             cmd_max_size=config.history.cmd_max_size,
         )
+        self._history_read: Optional["asyncio.Future[None]"] = None
         self._kb_mode = KBMode.normal
 
-        self._error_mode = Condition(lambda: self._kb_mode == KBMode.error)
-        self._command_mode = Condition(lambda: self._kb_mode == KBMode.command)
-        self._normal_mode = Condition(lambda: self._kb_mode == KBMode.normal)
-        self._search_mode = Condition(lambda: self._kb_mode == KBMode.search)
-        self._reverse_search_mode = Condition(
-            lambda: self._kb_mode == KBMode.reverse_search
-        )
+        self._error_mode = self._kb_mode_filter(KBMode.error)
+        self._command_mode = self._kb_mode_filter(KBMode.command)
+        self._normal_mode = self._kb_mode_filter(KBMode.normal)
+        self._search_mode = self._kb_mode_filter(KBMode.search)
+        self._reverse_search_mode = self._kb_mode_filter(KBMode.reverse_search)
 
         self._error = ""
         self._error_type = ErrorType.error
@@ -79,25 +125,10 @@ class App:
             error_type=lambda: self._error_type,
         )
 
-        self._layout_single = Condition(lambda: self._layout_mode == LayoutMode.single)
-        self._layout_vertical = Condition(
-            lambda: self._layout_mode == LayoutMode.vertical
-        )
+        self._layout_single = self._layout_filter(LayoutMode.single)
+        self._layout_vertical = self._layout_filter(LayoutMode.vertical)
 
-        self._left_pane = FilePane(
-            pane_id=Pane.left,
-            spinner_config=config.spinner,
-            linemode_config=config.linemode,
-            app_config=config.app,
-            redraw=self.redraw,
-            layout_single=self._layout_single,
-            layout_vertical=self._layout_vertical,
-            focus=lambda: self._filepane_focus,
-            history=self._history,
-            set_error=self.set_error,
-        )
-        self._right_pane = FilePane(
-            pane_id=Pane.right,
+        filepane_kwargs = dict(
             spinner_config=config.spinner,
             linemode_config=config.linemode,
             app_config=config.app,
@@ -108,9 +139,13 @@ class App:
             history=self._history,
             set_error=self.set_error,
         )
+        self._left_pane = FilePane(pane_id=Pane.left, **filepane_kwargs)
+        self._right_pane = FilePane(pane_id=Pane.right, **filepane_kwargs)
         self._command_pane = CommandPane(app=self)
         self._option_pane = OptionPane()
 
+        self._floats = [Float(content=self._option_pane), self._error_pane]
+        self._layouts: Dict[Tuple[bool, bool, FilePane, FilePane], Layout] = {}
         self._kb = KB(
             app=self,
             kb_maps=config.kb.kb_maps,
@@ -124,15 +159,43 @@ class App:
             after_render=self._after_render,
             style=self._style,
             key_bindings=self._kb,
+            min_redraw_interval=REDRAW_INTERVAL,
         )
 
     def redraw(self) -> None:
         """Instruct the app to redraw itself to the terminal.
 
         This is useful when trying to force an UI update of the :class:`App`.
+        Renders are limited to one every :data:`REDRAW_INTERVAL` seconds by
+        the `Application`.
         """
         self._app.invalidate()
 
+    def _kb_mode_filter(self, mode: KBMode) -> Condition:
+        """Create a filter checking the current `KBMode`.
+
+        The mode is captured by the closure so that evaluating the filter,
+        which happens on every key press and render, skips the enum lookup.
+
+        Args:
+            mode: Target `KBMode`.
+
+        Returns:
+            Filter which is true when `mode` is the current `KBMode`.
+        """
+        return Condition(lambda: self._kb_mode == mode)
+
+    def _layout_filter(self, layout: LayoutMode) -> Condition:
+        """Create a filter checking the current `LayoutMode`.
+
+        Args:
+            layout: Target `LayoutMode`.
+
+        Returns:
+            Filter which is true when `layout` is the current `LayoutMode`.
+        """
+        return Condition(lambda: self._layout_mode == layout)
+
     async def _load_pane_data(self, pane: FilePane) -> None:
         """Load the data for the target pane and refersh the app.
 
@@ -142,6 +205,16 @@ class App:
         await pane.load_data()
         self.redraw()
 
+    def _read_history(self) -> "asyncio.Future[None]":
+        """Start reading the history once and return the pending read.
+
+        Returns:
+            The history read which can be awaited multiple times.
+        """
+        if self._history_read is None:
+            self._history_read = asyncio.ensure_future(self._history.read())
+        return self._history_read
+
     async def _render_task(self) -> None:
         """Read history and instruct left/right pane to load appropriate data.
 
@@ -150,13 +223,15 @@ class App:
         cause the `App` UI to change and confuse the user.
         """
         if not self._no_history:
-            await self._history.read()
-        self._left_pane.mode = self._history.left_mode
-        self._right_pane.mode = self._history.right_mode
-        self._left_pane.selected_file_index = self._history.left_index
-        self._right_pane.selected_file_index = self._history.right_index
-        self._left_pane.path = self._history.left_path
-        self._right_pane.path = self._history.right_path
+            await self._read_history()
+        self._left_pane.apply_history_state(
+            self._history.left_mode, self._history.left_index, self._history.left_path
+        )
+        self._right_pane.apply_history_state(
+            self._history.right_mode,
+            self._history.right_index,
+            self._history.right_path,
+        )
         self.pane_focus(self._history.focus)
         self.layout_switch(self._history.layout)
         self._kb.activated = True
@@ -173,18 +248,82 @@ class App:
 
         Loading all relevant data in this method can turn the whole data loading into an
         async experience.
+
+        After the first render the handler is replaced by :meth:`App._run_effects`,
+        or removed from the `Application` when there are no custom effects.
         """
-        for use_effect in self._custom_effects:
-            use_effect(self)
+        self._run_effects(_)
         if not self._rendered:
             self._rendered = True
             self._left_pane.loading = True
             self._right_pane.loading = True
             asyncio.create_task(self._render_task())
+            self._app.after_render -= self._after_render
+            if self._custom_effects:
+                self._app.after_render += self._run_effects
+
+    def _run_effects(self, _) -> None:
+        """Run the custom effects.
+
+        Custom effects with dependencies only run when one of them changed.
+        """
+        for index, (use_effect, deps) in enumerate(self._custom_effects):
+            if deps is not None:
+                snapshot = tuple(getattr(self, dep) for dep in deps)
+                if self._effect_snapshots.get(index) == snapshot:
+                    continue
+                self._effect_snapshots[index] = snapshot
+            use_effect(self)
 
     async def run(self) -> None:
-        """Start the application in async mode."""
-        await self._app.run_async()
+        """Start the application in async mode.
+
+        The default executor is replaced with one sized for the blocking
+        S3 and file system calls offloaded by the panes. The S3 client is
+        created and the history is read in the background while the first
+        frame is rendered.
+
+        The history is written in the executor after the application exits,
+        even when it exits with an error, so that a slow disk does not hold up
+        restoring the terminal. The executor is shut down last, once nothing
+        is left to schedule work on it.
+        """
+        self._executor = ThreadPoolExecutor(
+            max_workers=self._io_threads, thread_name_prefix="s3fm"
+        )
+        loop = asyncio.get_running_loop()
+        loop.set_default_executor(self._executor)
+        self._warmup = loop.run_in_executor(
+            None, S3(max_pool_connections=self._io_threads).warmup
+        )
+        if not self._no_history:
+            self._read_history()
+        try:
+            await self._app.run_async()
+        finally:
+            try:
+                if not self._no_history:
+                    await loop.run_in_executor(None, self._history.write)
+            finally:
+                self._shutdown_executor()
+
+    def _shutdown_executor(self) -> None:
+        """Stop the executor without waiting for the work queued on it.
+
+        Pending prefetch timers and the client warmup are cancelled first so
+        that nothing schedules work on the executor once it is shut down.
+        Queued work, such as prefetches, is cancelled so that it does not
+        delay the exit.
+        """
+        self._left_pane.cancel_prefetch()
+        self._right_pane.cancel_prefetch()
+        if self._warmup is not None:
+            self._warmup.cancel()
+        if self._executor is not None:
+            if _CANCEL_FUTURES:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+            else:
+                self._executor.shutdown(wait=False)
 
     def pane_focus(self, pane: Pane) -> None:
         """Focus specified pane and set the focus state.
@@ -198,20 +337,31 @@ class App:
             >>> app = App() # doctest: +SKIP
             >>> app.pane_focus(Pane.left) # doctest: +SKIP
         """
-        if pane in self.filepanes:
+        if pane == Pane.left or pane == Pane.right:
             self._kb_mode = KBMode.normal
             self._filepane_focus = pane
         else:
-            _kb_mode_map = {
-                CommandMode.command: KBMode.command,
-                CommandMode.search: KBMode.search,
-                CommandMode.reverse_search: KBMode.reverse_search,
-            }
-            self._kb_mode = _kb_mode_map.get(self._command_pane.mode, KBMode.command)
+            self._kb_mode = _KB_MODE_MAP.get(self._command_pane.mode, KBMode.command)
         self._previous_focus = self._current_focus
         self._current_focus = pane
         self._app.layout.focus(self.current_focus)
 
+    def _focus_filepane(self, pane: Pane, filepane: FilePane) -> None:
+        """Focus a filepane that the caller has already resolved.
+
+        Used by :meth:`App.pane_swap` which knows the target container and can
+        skip the checks done in :meth:`App.pane_focus`.
+
+        Args:
+            pane: Target filepane id.
+            filepane: The filepane container of `pane`.
+        """
+        self._kb_mode = KBMode.normal
+        self._filepane_focus = pane
+        self._previous_focus = self._current_focus
+        self._current_focus = pane
+        self._app.layout.focus(filepane)
+
     def pane_focus_other(self) -> None:
         """Focus the other filepane.
 
@@ -221,7 +371,7 @@ class App:
         This method won't have any effect if the current UI only have
         one filepane.
         """
-        if not self._layout_single():
+        if self._layout_mode != LayoutMode.single:
             self.pane_focus(
                 Pane.left if self._current_focus == Pane.right else Pane.right
             )
@@ -244,7 +394,11 @@ class App:
         self.pane_focus(self._previous_focus or Pane.left)
 
     def exit(self) -> None:
-        """Exit the application and kill all spawed processes."""
+        """Exit the application.
+
+        The history is only written and the executor shut down by
+        :meth:`App.run` once the UI is torn down.
+        """
         self._history.left_mode = self._left_pane.mode
         self._history.right_mode = self._right_pane.mode
         self._history.left_index = self._left_pane.selected_file_index
@@ -253,13 +407,13 @@ class App:
         self._history.right_path = self._right_pane.path
         self._history.focus = self._filepane_focus
         self._history.layout = self._layout_mode
-        if not self._no_history:
-            self._history.write()
         self._app.exit()
 
     def layout_switch(self, layout: LayoutMode) -> None:
         """Switch to a different layout.
 
+        Nothing happens when `layout` is already the current layout.
+
         Args:
             layout: Desired layout mode to switch.
 
@@ -269,6 +423,8 @@ class App:
             >>> app = App() # doctest: +SKIP
             >>> app.layout_switch(LayoutMode.vertical) # doctest: +SKIP
         """
+        if layout == self._layout_mode:
+            return
         self._layout_mode = layout
         if layout != LayoutMode.single:
             self._app.layout = self.layout
@@ -293,31 +449,14 @@ class App:
             >>> app = App() # doctest: +SKIP
             >>> app.pane_swap(Direction.left, LayoutMode.vertical) # doctest: +SKIP
         """
-        if self._layout_single():
-            return
-        if (
-            self._current_focus == Pane.right
-            and (direction == Direction.right or direction == Direction.down)
-            and self._layout_mode == layout
-        ):
+        if self._layout_mode == LayoutMode.single:
             return
-        if (
-            self._current_focus == Pane.left
-            and (direction == Direction.left or direction == Direction.up)
-            and self._layout_mode == layout
-        ):
+        action = _SWAP_TABLE.get(
+            (self._current_focus, direction, self._layout_mode, layout), _SWAP_PANES
+        )
+        if action == _SWAP_NOOP:
             return
-        pane_swapped = False
-        if not (
-            self._current_focus == Pane.right
-            and (direction == Direction.right or direction == Direction.down)
-            and self._layout_mode != layout
-        ) and not (
-            self._current_focus == Pane.left
-            and (direction == Direction.left or direction == Direction.up)
-            and self._layout_mode != layout
-        ):
-            pane_swapped = True
+        if action == _SWAP_PANES:
             self._left_pane, self._right_pane = self._right_pane, self._left_pane
             self._left_pane.id, self._right_pane.id = (
                 self._right_pane.id,
@@ -325,10 +464,12 @@ class App:
             )
         self._layout_mode = layout
         self._app.layout = self.layout
-        if pane_swapped:
-            self.pane_focus_other()
-        else:
-            self.pane_focus(self._current_focus)
+        pane = self._current_focus
+        if action == _SWAP_PANES:
+            pane = Pane.left if pane == Pane.right else Pane.right
+        self._focus_filepane(
+            pane, self._left_pane if pane == Pane.left else self._right_pane
+        )
 
     def set_error(self, exception: Optional["Notification"] = None) -> None:
         """Configure error notification for the application.
@@ -374,30 +515,28 @@ class App:
     @property
     def current_focus(self) -> "Container":
         """:class:`prompt_toolkit.layout.Container`: Get current focused pane."""
-        try:
-            return {
-                **self.filepanes,
-                Pane.cmd: self._command_pane,
-                Pane.error: self._error_pane,
-            }[self._current_focus]
-        except KeyError:
-            self.set_error(
-                Notification("Unexpected focus.", error_type=ErrorType.warning)
-            )
-            self.pane_focus(Pane.left)
-            return self.current_focus
+        if self._current_focus == Pane.left:
+            return self._left_pane
+        if self._current_focus == Pane.right:
+            return self._right_pane
+        if self._current_focus == Pane.cmd:
+            return self._command_pane
+        if self._current_focus == Pane.error:
+            return self._error_pane
+        self.set_error(Notification("Unexpected focus.", error_type=ErrorType.warning))
+        self.pane_focus(Pane.left)
+        return self.current_focus
 
     @property
     def current_filepane(self) -> FilePane:
         """:class:`~s3fm.ui.filepane.FilePane`: Get current focused filepane."""
-        try:
-            return self.filepanes[self._filepane_focus]
-        except KeyError:
-            self.set_error(
-                Notification("Unexpected focus.", error_type=ErrorType.warning)
-            )
-            self._filepane_focus = Pane.left
-            return self.current_filepane
+        if self._filepane_focus == Pane.left:
+            return self._left_pane
+        if self._filepane_focus == Pane.right:
+            return self._right_pane
+        self.set_error(Notification("Unexpected focus.", error_type=ErrorType.warning))
+        self._filepane_focus = Pane.left
+        return self.current_filepane
 
     @property
     def file_pane_focus(self) -> Pane:
@@ -414,31 +553,37 @@ class App:
 
     @property
     def layout(self) -> Layout:
-        """:class:`prompt_toolkit.layout.Layout`: Get app layout dynamically."""
-        if self._layout_mode == LayoutMode.vertical:
-            layout = HSplit(
-                [VSplit([self._left_pane, self._right_pane]), self._command_pane]
-            )
+        """:class:`prompt_toolkit.layout.Layout`: Get app layout dynamically.
 
-        elif (
-            self._layout_mode == LayoutMode.horizontal
-            or self._layout_mode == LayoutMode.single
-        ):
-            layout = HSplit([self._left_pane, self._right_pane, self._command_pane])
-        else:
+        Layouts are cached by their structure and reused when switching back.
+        """
+        vertical = _LAYOUT_VERTICAL.get(self._layout_mode)
+        if vertical is None:
             self._layout_mode = LayoutMode.vertical
             self.set_error(
                 Notification("Unexpected layout.", error_type=ErrorType.warning)
             )
             return self.layout
+        key = (vertical, self._border, self._left_pane, self._right_pane)
+        cached = self._layouts.get(key)
+        if cached is not None:
+            return cached
+
+        if vertical:
+            layout = HSplit(
+                [VSplit([self._left_pane, self._right_pane]), self._command_pane]
+            )
+        else:
+            layout = HSplit([self._left_pane, self._right_pane, self._command_pane])
         if self._border:
             layout = Frame(layout)
-        return Layout(
+        self._layouts[key] = Layout(
             FloatContainer(
                 content=layout,
-                floats=[Float(content=self._option_pane), self._error_pane],
+                floats=self._floats,
             )
         )
+        return self._layouts[key]
 
     @property
     def kb(self) -> KB:
@@ -449,3 +594,34 @@ class App:
     def rendered(self) -> bool:
         """bool: :class:`App` rendered status."""
         return self._rendered
+
+
+def _get_effect_attrs(deps: Optional[Tuple[str, ...]]) -> Optional[Tuple[str, ...]]:
+    """Resolve the dependencies of a custom effect to :class:`App` attributes.
+
+    Args:
+        deps: Dependencies registered with :meth:`s3fm.api.config.AppConfig.use_effect`.
+
+    Returns:
+        The plain attributes to compare between renders or `None`
+        when the effect runs on every render.
+    """
+    if deps is None:
+        return None
+    return tuple(dict.fromkeys(EFFECT_DEPS[dep] for dep in deps))
+
+
+@lru_cache(maxsize=8)
+def _get_style(rules: Tuple[Tuple[str, str], ...]) -> Style:
+    """Create the application style.
+
+    Cached by the style rules so that creating another :class:`App` with
+    the same style config does not parse the rules again.
+
+    Args:
+        rules: Style class and style string pairs from the style config.
+
+    Returns:
+        A :class:`prompt_toolkit.styles.Style` instance.
+    """
+    return Style(list(rules))
@@ -1,9 +1,10 @@
 """Module contains the main filepane which is used as the left/right pane."""
 import asyncio
+import inspect
 import math
 from functools import wraps
 from pathlib import Path
-from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
 
 from prompt_toolkit.filters.base import Condition
 from prompt_toolkit.layout.containers import (
@@ -25,6 +26,8 @@ from s3fm.exceptions import ClientError, Notification
 from s3fm.ui.spinner import Spinner
 from s3fm.utils import get_dimension
 
+PREFETCH_DELAY = 0.2
+
 
 def hist_dir(func: Callable[..., Awaitable[None]]):
     """Decorate a :class:`~s3fm.ui.filepane.FilePane` method to store the path history.
@@ -44,13 +47,13 @@ def hist_dir(func: Callable[..., Awaitable[None]]):
     @wraps(func)
     async def executable(*args, **kwargs):
         curr_path = str(
-            args[0]._fs._path if args[0]._mode == PaneMode.fs else args[0]._s3._path
+            args[0]._fs._path if args[0]._mode == PaneMode.fs else args[0]._s3.path
         )
         curr_result = args[0]._history._directory.get(curr_path, 0)
         args[0]._history._directory[curr_path] = args[0]._selected_file_index
         await func(*args, **kwargs)
         new_path = str(
-            args[0]._fs._path if args[0]._mode == PaneMode.fs else args[0]._s3._path
+            args[0]._fs._path if args[0]._mode == PaneMode.fs else args[0]._s3.path
         )
         if new_path == curr_path:
             args[0]._history._directory[curr_path] = curr_result
@@ -89,6 +92,42 @@ def spin_spinner(func: Callable[..., Awaitable[None]]):
     return executable
 
 
+def prefetch_selection(func: Callable[..., Any]):
+    """Decorate a :class:`~s3fm.ui.filepane.FilePane` method that moves the selection.
+
+    A pending prefetch is cancelled before the method runs and a new one is
+    scheduled for the selection the method ends on.
+
+    Args:
+        func: The function to decorate, either sync or async.
+
+    Returns:
+        Decorated function.
+
+    Examples:
+        >>> @prefetch_selection
+        ... def _(filepane: FilePane):
+        ...     pass
+    """
+    if inspect.iscoroutinefunction(func):
+
+        @wraps(func)
+        async def async_executable(*args, **kwargs):
+            args[0].cancel_prefetch()
+            await func(*args, **kwargs)
+            args[0]._prefetch_selection()
+
+        return async_executable
+
+    @wraps(func)
+    def executable(*args, **kwargs):
+        args[0].cancel_prefetch()
+        func(*args, **kwargs)
+        args[0]._prefetch_selection()
+
+    return executable
+
+
 def file_action(func: Callable[..., Awaitable[None]]):
     """Decorate a method related to file action.
 
@@ -156,12 +195,14 @@ class FilePane(ConditionalContainer):
         history: History,
         set_error: Callable[[Optional[Notification]], None],
     ) -> None:
-        self._s3 = S3()
+        self._s3 = S3(max_pool_connections=app_config.io_threads)
         self._fs = FS()
         self._mode = PaneMode.s3
         self._loaded = False
         self._files: List[File] = []
         self._filtered_files: List[File] = []
+        self._visible_source: Optional[List[File]] = None
+        self._visible_files: List[File] = []
         self._searched_indices: Optional[Dict[int, List[int]]] = None
         self._loading = True
         self._dimension_offset = 0 if not app_config.border else 2
@@ -179,6 +220,7 @@ class FilePane(ConditionalContainer):
         self._last_line = self._get_height() - self._first_line
         self._history = history
         self._set_error = set_error
+        self._prefetch_handle: Optional[asyncio.TimerHandle] = None
 
         self._spinner = Spinner(
             loading=Condition(lambda: self._loading),
@@ -306,12 +348,13 @@ class FilePane(ConditionalContainer):
             self._first_line = 0
             self._last_line = self._first_line + min(height, self.file_count)
 
+        focused = self._focus()
         for index in range(self._first_line, self._last_line):
             file = self.files[index]
             file_style, icon, name, info = self._get_file_info(file)
 
             style_class = "class:filepane.other_line"
-            if index == self._selected_file_index and self._focus():
+            if index == self._selected_file_index and focused:
                 style_class = "class:filepane.current_line"
                 display_files.append(("[SetCursorPosition]", ""))
             style_class += " %s" % file_style
@@ -380,6 +423,33 @@ class FilePane(ConditionalContainer):
 
         return style_class, icon, file_name, file_info
 
+    def _prefetch_selection(self) -> None:
+        """Prefetch the s3 directory or bucket under the cursor.
+
+        The prefetch is only started once the selection stays on the same
+        directory for :data:`PREFETCH_DELAY` seconds. The directory is resolved
+        against the s3 path at the time of scheduling.
+        """
+        self.cancel_prefetch()
+        selection = self.current_selection
+        if (
+            not self._loaded
+            or self._mode != PaneMode.s3
+            or selection is None
+            or selection.name == ".."
+            or (selection.type != FileType.dir and selection.type != FileType.bucket)
+        ):
+            return
+        self._prefetch_handle = asyncio.get_running_loop().call_later(
+            PREFETCH_DELAY, self._s3.prefetch, selection.name, self._s3.path
+        )
+
+    def cancel_prefetch(self) -> None:
+        """Cancel the prefetch scheduled by moving the selection."""
+        if self._prefetch_handle is not None:
+            self._prefetch_handle.cancel()
+            self._prefetch_handle = None
+
     def _get_width_dimension(self) -> LayoutDimension:
         """Retrieve the width dimension dynamically.
 
@@ -419,6 +489,7 @@ class FilePane(ConditionalContainer):
                 height = math.floor(height / 2) - 1
         return height
 
+    @prefetch_selection
     def scroll_down(
         self, value: int = 1, page: bool = False, bottom: bool = False
     ) -> None:
@@ -443,6 +514,7 @@ class FilePane(ConditionalContainer):
             if self._selected_file_index >= self.file_count:
                 self._selected_file_index = self.file_count - 1
 
+    @prefetch_selection
     def scroll_up(self, value: int = 1, page: bool = False, top: bool = False) -> None:
         """Move current selection up.
 
@@ -465,6 +537,7 @@ class FilePane(ConditionalContainer):
             if self._selected_file_index < 0:
                 self._selected_file_index = 0
 
+    @prefetch_selection
     def page_up(self, value: int = 1) -> None:
         """Scroll page up.
 
@@ -481,6 +554,7 @@ class FilePane(ConditionalContainer):
         self._last_line -= value
         self._selected_file_index -= value
 
+    @prefetch_selection
     def page_down(self, value: int = 1) -> None:
         """Scroll page down.
 
@@ -497,6 +571,7 @@ class FilePane(ConditionalContainer):
         self._last_line += value
         self._selected_file_index += value
 
+    @prefetch_selection
     @hist_dir
     @spin_spinner
     @file_action
@@ -528,6 +603,7 @@ class FilePane(ConditionalContainer):
             return await self.forward()
         await self.filter_files()
 
+    @prefetch_selection
     @hist_dir
     @spin_spinner
     async def backword(self) -> None:
@@ -555,14 +631,19 @@ class FilePane(ConditionalContainer):
         When the filepane change its hidden display status, if the current
         highlight is a hidden file, the app will lost its highlighted line.
         Use this method to shift down until it found a file thats not hidden.
+
+        The visible files are kept for the current file list so that toggling
+        the hidden status back and forth does not filter the files again.
         """
         if self._display_hidden:
             self._filtered_files = self._files
-        else:
-            self._filtered_files = list(
-                filter(lambda file: not file.hidden, self._files)
-            )
+            return
+        if self._visible_source is not self._files:
+            self._visible_source = self._files
+            self._visible_files = [file for file in self._files if not file.hidden]
+        self._filtered_files = self._visible_files
 
+    @prefetch_selection
     @spin_spinner
     async def load_data(self) -> None:
         """Load the data into filepane.
@@ -614,6 +695,21 @@ class FilePane(ConditionalContainer):
         """
         self._set_error(notification)
 
+    def apply_history_state(self, mode: PaneMode, index: int, path: str) -> None:
+        """Restore the pane state read from :class:`~s3fm.api.history.History`.
+
+        Sets the mode first so that `path` is applied to the matching file system.
+        Nothing is loaded or redrawn, call :meth:`FilePane.load_data` afterwards.
+
+        Args:
+            mode: Pane mode to restore.
+            index: Selection index to restore.
+            path: Filepath to restore.
+        """
+        self._mode = mode
+        self._selected_file_index = index
+        self.path = path
+
     async def pane_toggle_hidden_files(self, value: bool = None) -> None:
         """Toggle the current focused pane display hidden file status.
 
@@ -627,8 +723,13 @@ class FilePane(ConditionalContainer):
         Args:
             value: Optional bool value to indicate show/hide.
                 If not provided, it will toggle the hidden file status.
+                Nothing is refiltered when it matches the current status.
         """
-        self.display_hidden_files = value or not self.display_hidden_files
+        if value is None:
+            value = not self.display_hidden_files
+        elif value == self.display_hidden_files:
+            return
+        self.display_hidden_files = value
         await self.filter_files()
 
     async def pane_switch_mode(self, mode: PaneMode = None) -> None:
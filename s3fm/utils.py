@@ -5,7 +5,7 @@ have no dependency or interaction with `prompt_toolkit`.
 """
 import asyncio
 import shutil
-from functools import partial
+from functools import lru_cache, partial
 from typing import Any, Awaitable, Callable, Optional, Tuple
 
 
@@ -34,6 +34,10 @@ def get_dimension(offset: int = 0) -> Tuple[int, int]:
 def transform_async(func: Callable[..., Any]) -> Callable[..., Awaitable[Any]]:
     """Transform a standard blocking call to async call.
 
+    The call runs in the event loop's default thread pool executor unless
+    an `executor` is provided. The wrapped calls are I/O bound so threads
+    avoid the process startup and pickling cost of a process pool.
+
     Args:
         func: The function to transform.
 
@@ -67,9 +71,12 @@ def transform_async(func: Callable[..., Any]) -> Callable[..., Awaitable[Any]]:
     return run
 
 
+@lru_cache(maxsize=4096)
 def human_readable_size(value: float) -> Optional[str]:
     """Convert bytes to human readable size.
 
+    Cached as the same files are formatted again on every refresh.
+
     Args:
         value: Value in bytes.
 
@@ -1,6 +1,7 @@
 from unittest.mock import ANY
 
 import pytest
+from prompt_toolkit.filters.base import Always, Condition
 from prompt_toolkit.keys import Keys
 from pytest_mock.plugin import MockerFixture
 
@@ -25,6 +26,17 @@ def test_app_config():
 
     assert config.custom_effects == [hello]
 
+    @config.use_effect(deps=("current_filepane",))
+    def world(app):
+        pass
+
+    assert config.custom_effects == [hello, world]
+    assert config.effect_deps == {world: ("current_filepane",)}
+
+    with pytest.raises(ClientError):
+        config.use_effect(lambda _: None, deps=("current_filpane",))
+    assert config.custom_effects == [hello, world]
+
 
 def test_linemod_config():
     config = LineModeConfig()
@@ -94,6 +106,12 @@ def test_kb_config_map(mocker: MockerFixture):
         KBMode.normal: {str(kb1): kb1, str(kb2): kb2},
         KBMode.command: {},
     }
+    assert isinstance(kb.custom_kb_maps[KBMode.normal][str(kb1)][0]["filter"], Always)
+
+    kb.map(action=kb2, keys=Keys.ControlD, filter=lambda: False)
+    assert isinstance(
+        kb.custom_kb_maps[KBMode.normal][str(kb2)][1]["filter"], Condition
+    )
 
 
 def test_kb_config_unmap(mocker: MockerFixture):
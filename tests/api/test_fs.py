@@ -1,6 +1,8 @@
+import asyncio
 import json
 import os
 import tempfile
+import time
 from contextlib import contextmanager
 from datetime import datetime
 from pathlib import Path
@@ -8,10 +10,19 @@ from unittest.mock import ANY, PropertyMock
 
 import boto3
 import pytest
+from botocore.exceptions import ClientError, NoRegionError
 from botocore.stub import Stubber
 from pytest_mock.plugin import MockerFixture
 
-from s3fm.api.fs import FS, S3, File
+from s3fm.api.fs import (
+    FS,
+    MAX_POOL_CONNECTIONS,
+    MAX_PREFETCH,
+    PREFETCH_TTL,
+    S3,
+    File,
+    _create_client,
+)
 from s3fm.enums import FileType
 from s3fm.exceptions import Notification
 
@@ -50,6 +61,18 @@ def fs(test_files, test_dirs):
         yield fs
 
 
+def test_file_hidden():
+    assert File(name=".hello", type=FileType.file, info="", index=0, raw=None).hidden
+    assert not File(name="hello", type=FileType.file, info="", index=0, raw=None).hidden
+    assert not File(name="..", type=FileType.dir, info="", index=0, raw=None).hidden
+    assert File(
+        name="hello", type=FileType.file, info="", index=0, raw=None, hidden=True
+    ).hidden
+    assert File(name=".hello", type=FileType.file, info="", index=0, raw=None) == File(
+        name=".hello", type=FileType.file, info="", index=0, raw=None, hidden=True
+    )
+
+
 class TestFS:
     @pytest.mark.asyncio
     async def test_list_files(self, fs: FS, test_dirs, test_files):
@@ -60,7 +83,7 @@ class TestFS:
     async def test_cd(self, fs: FS, test_dirs):
         cwd = fs.path
         assert await fs.cd(Path(test_dirs[0])) == [
-            File(name="..", type=FileType.dir, info="", hidden=False, index=0, raw=None)
+            File(name="..", type=FileType.dir, info="", index=0, raw=None)
         ]
         assert fs.path == cwd.joinpath(test_dirs[0]).resolve()
 
@@ -79,18 +102,13 @@ class TestFS:
     @pytest.mark.asyncio
     async def test_get_paths(self, fs: FS, test_dirs, test_files):
         assert await fs.get_paths() == [
-            File(name="..", type=FileType.dir, info="", hidden=False, index=0, raw=ANY),
-            File(
-                name="4xx/", type=FileType.dir, info="", hidden=False, index=1, raw=ANY
-            ),
-            File(
-                name="5xx/", type=FileType.dir, info="", hidden=False, index=2, raw=ANY
-            ),
+            File(name="..", type=FileType.dir, info="", index=0, raw=ANY),
+            File(name="4xx/", type=FileType.dir, info="", index=1, raw=ANY),
+            File(name="5xx/", type=FileType.dir, info="", index=2, raw=ANY),
             File(
                 name=".6.txt",
                 type=FileType.file,
                 info="0 B",
-                hidden=True,
                 index=3,
                 raw=ANY,
             ),
@@ -98,7 +116,6 @@ class TestFS:
                 name="1.txt",
                 type=FileType.file,
                 info="0 B",
-                hidden=False,
                 index=4,
                 raw=ANY,
             ),
@@ -106,7 +123,6 @@ class TestFS:
                 name="2.txt",
                 type=FileType.file,
                 info="0 B",
-                hidden=False,
                 index=5,
                 raw=ANY,
             ),
@@ -114,7 +130,6 @@ class TestFS:
                 name="3.txt",
                 type=FileType.file,
                 info="0 B",
-                hidden=False,
                 index=6,
                 raw=ANY,
             ),
@@ -133,8 +148,8 @@ class TestS3:
         for bucket in response["Buckets"]:
             bucket["CreationDate"] = curr_time
 
-        patched_s3 = mocker.patch.object(S3, "_list_buckets")
-        patched_s3.return_value = response
+        mocked_client = mocker.patch.object(S3, "client", new_callable=PropertyMock)
+        mocked_client.return_value.list_buckets.return_value = response
 
         s3 = S3()
         assert await s3._get_buckets() == [
@@ -142,7 +157,6 @@ class TestS3:
                 name="bucket1/",
                 type=FileType.bucket,
                 info=str(curr_time),
-                hidden=False,
                 index=0,
                 raw={"Name": "bucket1", "CreationDate": curr_time},
             ),
@@ -150,7 +164,6 @@ class TestS3:
                 name="bucket2/",
                 type=FileType.bucket,
                 info=str(curr_time),
-                hidden=False,
                 index=1,
                 raw={"Name": "bucket2", "CreationDate": curr_time},
             ),
@@ -158,7 +171,6 @@ class TestS3:
                 name="bucket3/",
                 type=FileType.bucket,
                 info=str(curr_time),
-                hidden=False,
                 index=2,
                 raw={"Name": "bucket3", "CreationDate": curr_time},
             ),
@@ -166,7 +178,6 @@ class TestS3:
                 name="bucket4/",
                 type=FileType.bucket,
                 info=str(curr_time),
-                hidden=False,
                 index=3,
                 raw={"Name": "bucket4", "CreationDate": curr_time},
             ),
@@ -174,7 +185,6 @@ class TestS3:
                 name="bucket5/",
                 type=FileType.bucket,
                 info=str(curr_time),
-                hidden=False,
                 index=4,
                 raw={"Name": "bucket5", "CreationDate": curr_time},
             ),
@@ -187,20 +197,27 @@ class TestS3:
         ).open("r") as file:
             response = json.load(file)
 
-        patched_s3 = mocker.patch.object(S3, "_list_objects")
-        patched_s3.return_value = response
+        mocked_client = mocker.patch.object(S3, "client", new_callable=PropertyMock)
+        paginator = mocked_client.return_value.get_paginator.return_value
+        paginator.paginate.return_value = [
+            response,
+            {
+                "CommonPrefixes": [{"Prefix": "hello/dir4/"}],
+                "Contents": [
+                    {"Key": "hello/dir4/", "Size": 0},
+                    {"Key": "hello/.file4", "Size": 1},
+                ],
+            },
+        ]
 
         s3 = S3()
-        s3._bucket_name = "bucket1"
+        s3.path = Path("bucket1/hello")
         assert await s3._get_objects() == [
-            File(
-                name="dir1/", type=FileType.dir, info="", hidden=False, index=0, raw=ANY
-            ),
+            File(name="dir1/", type=FileType.dir, info="", index=0, raw=ANY),
             File(
                 name="dir2/",
                 type=FileType.dir,
                 info="",
-                hidden=False,
                 index=1,
                 raw=None,
             ),
@@ -208,35 +225,51 @@ class TestS3:
                 name="dir3/",
                 type=FileType.dir,
                 info="",
-                hidden=False,
                 index=2,
                 raw=None,
             ),
+            File(
+                name="dir4/",
+                type=FileType.dir,
+                info="",
+                index=3,
+                raw=None,
+            ),
             File(
                 name=".file1",
                 type=FileType.file,
                 info="6.0 K",
-                hidden=True,
-                index=3,
+                index=4,
                 raw=ANY,
             ),
             File(
                 name="file2",
                 type=FileType.file,
                 info="151.9 K",
-                hidden=False,
-                index=4,
+                index=5,
                 raw=ANY,
             ),
             File(
                 name="file3",
                 type=FileType.file,
                 info="3.5 K",
-                hidden=False,
-                index=5,
+                index=6,
                 raw=ANY,
             ),
+            File(
+                name=".file4",
+                type=FileType.file,
+                info="1 B",
+                index=7,
+                raw={"Key": "hello/.file4", "Size": 1},
+            ),
         ]
+        mocked_client.return_value.get_paginator.assert_called_once_with(
+            "list_objects_v2"
+        )
+        paginator.paginate.assert_called_once_with(
+            Bucket="bucket1", Prefix="hello/", Delimiter="/"
+        )
 
     @pytest.mark.asyncio
     async def test_get_paths(self, mocker: MockerFixture):
@@ -250,32 +283,148 @@ class TestS3:
 
         patched_s3_object.reset_mock()
         patched_s3_bucket.reset_mock()
-        s3._path = Path("hello")
+        s3.path = Path("hello")
         await s3.get_paths()
         patched_s3_object.assert_called_once()
         patched_s3_bucket.assert_not_called()
 
+    def test_list_first_page(self, mocker: MockerFixture):
+        mocked_client = mocker.patch.object(S3, "client", new_callable=PropertyMock)
+        list_objects = mocked_client.return_value.list_objects_v2
+        list_objects.return_value = {
+            "CommonPrefixes": [{"Prefix": "hello/dir1/"}],
+            "Contents": [
+                {"Key": "hello/", "Size": 0},
+                {"Key": "hello/file1", "Size": 1},
+            ],
+            "IsTruncated": False,
+        }
+
+        s3 = S3()
+        assert s3._list_first_page("bucket1", "hello/", 1) == [
+            File(name="dir1/", type=FileType.dir, info="", index=1, raw=None),
+            File(name="file1", type=FileType.file, info="1 B", index=2, raw=ANY),
+        ]
+        list_objects.assert_called_once_with(
+            Bucket="bucket1", Prefix="hello/", Delimiter="/"
+        )
+
+        list_objects.return_value["IsTruncated"] = True
+        assert s3._list_first_page("bucket1", "hello/", 1) is None
+
+    @pytest.mark.asyncio
+    async def test_prefetch(self, mocker: MockerFixture):
+        files = [File(name="file1", type=FileType.file, info="", index=1, raw=None)]
+        mocked_list = mocker.patch.object(S3, "_list_first_page", return_value=files)
+        patched_s3_object = mocker.patch.object(S3, "_get_objects")
+
+        s3 = S3()
+        s3.path = Path("bucket1/hello")
+        s3.prefetch("dir1/")
+        s3.prefetch("dir1/")
+        s3.prefetch("dir2/", Path("bucket1/world"))
+        assert list(s3._prefetched) == [
+            ("bucket1", "hello", "dir1"),
+            ("bucket1", "world", "dir2"),
+        ]
+        started, future = s3._prefetched["bucket1", "world", "dir2"]
+        dropped = mocker.Mock()
+        s3._prefetched["bucket1", "world", "dir2"] = (started, dropped)
+        assert await s3.cd("dir1/") == [
+            File(name="..", type=FileType.dir, info="", index=0, raw=None)
+        ] + files
+        patched_s3_object.assert_not_called()
+        mocked_list.assert_any_call("bucket1", "hello/dir1/", 1)
+        assert s3._prefetched == {}
+        dropped.cancel.assert_called_once()
+        await future
+
+        s3.path = Path("")
+        s3.prefetch("bucket1/")
+        _, evicted = s3._prefetched["bucket1",]
+        await evicted
+        mocked_list.assert_called_with("bucket1", "", 1)
+
+        evicted = mocker.Mock()
+        s3._prefetched["bucket1",] = (s3._prefetched["bucket1",][0], evicted)
+        for index in range(MAX_PREFETCH):
+            s3.prefetch("other%s/" % index)
+        assert len(s3._prefetched) == MAX_PREFETCH
+        assert ("bucket1",) not in s3._prefetched
+        evicted.cancel.assert_called_once()
+        s3._cancel_prefetches()
+
+    @pytest.mark.asyncio
+    async def test_prefetch_stale(self, mocker: MockerFixture):
+        mocked_list = mocker.patch.object(S3, "_list_first_page", return_value=[])
+        patched_s3_object = mocker.patch.object(S3, "_get_objects", return_value=[])
+
+        s3 = S3()
+        s3.path = Path("bucket1")
+        s3.prefetch("dir1")
+        started, future = s3._prefetched["bucket1", "dir1"]
+        await future
+        s3._prefetched["bucket1", "dir1"] = (started - PREFETCH_TTL, future)
+        s3.prefetch("dir1")
+        started, refreshed = s3._prefetched["bucket1", "dir1"]
+        assert refreshed is not future
+        await refreshed
+        assert mocked_list.call_count == 2
+
+        s3._prefetched["bucket1", "dir1"] = (started - PREFETCH_TTL, refreshed)
+        await s3.cd("dir1")
+        patched_s3_object.assert_called_once_with(offset=1)
+
+    @pytest.mark.asyncio
+    async def test_prefetch_truncated(self, mocker: MockerFixture):
+        mocker.patch.object(S3, "_list_first_page", return_value=None)
+        patched_s3_object = mocker.patch.object(S3, "_get_objects", return_value=[])
+
+        s3 = S3()
+        s3.path = Path("bucket1")
+        s3.prefetch("dir1")
+        await s3.cd("dir1")
+        patched_s3_object.assert_called_once_with(offset=1)
+
+    @pytest.mark.asyncio
+    async def test_prefetch_error(self, mocker: MockerFixture):
+        mocked_list = mocker.patch.object(
+            S3, "_list_first_page", side_effect=ClientError({}, "ListObjectsV2")
+        )
+        patched_s3_object = mocker.patch.object(S3, "_get_objects", return_value=[])
+
+        s3 = S3()
+        s3.path = Path("bucket1")
+        s3.prefetch("dir1")
+        await s3.cd("dir1")
+        patched_s3_object.assert_called_once_with(offset=1)
+
+        mocked_list.side_effect = ValueError("bug")
+        s3.prefetch("dir2")
+        with pytest.raises(ValueError):
+            await s3.cd("dir2")
+
     @pytest.mark.asyncio
     async def test_cd(self, mocker: MockerFixture):
         patched_s3 = mocker.patch.object(S3, "get_paths")
 
         s3 = S3()
-        s3._path = Path("1/2")
+        s3.path = Path("1/2")
 
         await s3.cd()
-        assert s3._path == Path("1")
+        assert s3.path == Path("1")
 
-        s3._path = Path("1/2")
+        s3.path = Path("1/2")
         await s3.cd("..")
-        assert s3._path == Path("1")
+        assert s3.path == Path("1")
 
-        s3._path = Path("1/2")
+        s3.path = Path("1/2")
         await s3.cd("3")
-        assert s3._path == Path("1/2/3")
+        assert s3.path == Path("1/2/3")
 
-        s3._path = Path("1/2")
+        s3.path = Path("1/2")
         await s3.cd("3", override=True)
-        assert s3._path == Path("3")
+        assert s3.path == Path("3")
 
     def test_bucket_name(self):
         s3 = S3()
@@ -306,3 +455,52 @@ class TestS3:
 
         s3.path = Path("hello.com/yes/no")
         assert s3.uri == "s3://hello.com/yes/no"
+
+    def test_client(self, mocker: MockerFixture):
+        mocked_session = mocker.patch("boto3.Session")
+        _create_client.cache_clear()
+        s3 = S3()
+        assert s3.client is s3.client
+        assert S3().client is s3.client
+        mocked_session.assert_called_once_with(
+            region_name="ap-southeast-2", profile_name=None
+        )
+        mocked_session.return_value.client.assert_called_once_with("s3", config=ANY)
+        config = mocked_session.return_value.client.call_args[1]["config"]
+        assert config.max_pool_connections == MAX_POOL_CONNECTIONS
+
+        mocked_session.reset_mock()
+        S3(max_pool_connections=64).client
+        mocked_session.assert_called_once()
+        config = mocked_session.return_value.client.call_args[1]["config"]
+        assert config.max_pool_connections == 64
+        _create_client.cache_clear()
+
+    def test_warmup(self, mocker: MockerFixture):
+        mocked_client = mocker.patch.object(S3, "client", new_callable=PropertyMock)
+        S3().warmup()
+        mocked_client.assert_called_once()
+
+        mocked_client.side_effect = NoRegionError
+        S3().warmup()
+
+        mocked_client.side_effect = ClientError({}, "ListBuckets")
+        S3().warmup()
+
+        mocked_client.side_effect = ValueError("invalid endpoint")
+        with pytest.raises(ValueError):
+            S3().warmup()
+
+    @pytest.mark.asyncio
+    async def test_client_concurrent(self, mocker: MockerFixture):
+        mocked_session = mocker.patch("boto3.Session")
+        mocked_session.side_effect = lambda **_: time.sleep(0.05) or mocker.MagicMock()
+        _create_client.cache_clear()
+        loop = asyncio.get_running_loop()
+        clients = await asyncio.gather(
+            loop.run_in_executor(None, lambda: S3().client),
+            loop.run_in_executor(None, lambda: S3().client),
+        )
+        assert clients[0] is clients[1]
+        mocked_session.assert_called_once()
+        _create_client.cache_clear()
@@ -41,7 +41,69 @@ async def test_write(mocker: MockerFixture, hist_file):
 
     history = History()
     history._left_index = 100
+    history._directory["/tmp"] = 2
     history.write()
     history._left_index = 0
     await history.read()
     assert history._left_index == 100
+    assert history._directory["/tmp"] == 2
+    assert not hist_file.with_suffix(".json.tmp").exists()
+
+
+def test_directory():
+    directory = Directory({"a": 1, "b": 2, "c": 3}, size_limit=3)
+    directory["a"] = 4
+    assert list(directory) == ["b", "c", "a"]
+    directory["d"] = 5
+    assert list(directory.items()) == [("c", 3), ("a", 4), ("d", 5)]
+    assert "b" not in directory
+    assert directory.get("b", 0) == 0
+    assert directory["a"] == 4
+    assert len(directory) == 3
+    assert dict(directory) == {"c": 3, "a": 4, "d": 5}
+
+
+def test_hist_file(mocker: MockerFixture):
+    with tempfile.TemporaryDirectory() as tempdir:
+        mocker.patch.dict(os.environ, {"XDG_DATA_HOME": tempdir})
+        mocker.patch("s3fm.api.history._IS_POSIX", True)
+        history = History()
+        assert history.hist_file == Path(tempdir).joinpath("s3fm", "history.json")
+        assert history.hist_file.parent.is_dir()
+        assert history.hist_file is history.hist_file
+
+        mocker.patch.dict(os.environ, {"XDG_DATA_HOME": str(Path(tempdir, "new"))})
+        assert history.hist_file == Path(tempdir).joinpath("s3fm", "history.json")
+        assert History().hist_file == Path(tempdir).joinpath(
+            "new", "s3fm", "history.json"
+        )
+
+
+@pytest.mark.asyncio
+async def test_read_no_file(mocker: MockerFixture):
+    mocked_hist = mocker.patch.object(History, "hist_file", new_callable=PropertyMock)
+    mocked_hist.return_value = Path(tempfile.gettempdir()).joinpath("s3fm_no_history")
+
+    history = History()
+    await history.read()
+    assert history._left_index == 0
+
+
+@pytest.mark.asyncio
+async def test_write_unchanged(mocker: MockerFixture, hist_file):
+    mocked_hist = mocker.patch.object(History, "hist_file", new_callable=PropertyMock)
+    mocked_hist.return_value = hist_file
+    mocked_replace = mocker.patch("os.replace", wraps=os.replace)
+
+    history = History()
+    history.write()
+    mocked_replace.assert_called_once()
+
+    mocked_replace.reset_mock()
+    await history.read()
+    history.write()
+    mocked_replace.assert_not_called()
+
+    history._left_index = 100
+    history.write()
+    mocked_replace.assert_called_once()
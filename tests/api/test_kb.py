@@ -1,11 +1,16 @@
 from typing import NamedTuple
 
 import pytest
-from prompt_toolkit.key_binding.key_bindings import KeyBindings
-from prompt_toolkit.key_binding.key_processor import KeyPressEvent, KeyProcessor
+from prompt_toolkit.filters.base import Condition
+from prompt_toolkit.key_binding.key_bindings import KeyBindings, merge_key_bindings
+from prompt_toolkit.key_binding.key_processor import (
+    KeyPress,
+    KeyPressEvent,
+    KeyProcessor,
+)
 from pytest_mock.plugin import MockerFixture
 
-from s3fm.api.kb import KB
+from s3fm.api.kb import ALWAYS, KB, MAX_ACTION_MULTIPLIER, _flatten_kb_maps
 from s3fm.app import App
 from s3fm.enums import Direction, KBMode, LayoutMode
 from s3fm.ui.filepane import FilePane
@@ -30,7 +35,126 @@ def kb(app: App):
 
 def test_init(kb):
     assert isinstance(kb, KeyBindings)
-    assert len(kb.bindings) == 14
+    assert len(kb.bindings) == 26
+    assert len({binding.handler for binding in kb.bindings[-10:]}) == 1
+    assert len({binding.filter for binding in kb.bindings[-10:]}) == 1
+    assert kb.bindings[-1].handler == kb._pane_set_action_multiplier
+
+
+@pytest.mark.asyncio
+async def test_factory(mocker: MockerFixture, app: App):
+    called = []
+
+    def hello(app):
+        called.append(app)
+
+    kb = KB(
+        app=app,
+        kb_maps={
+            KBMode.normal: {"pane_forward": [{"keys": "l"}]},
+            KBMode.command: {},
+            KBMode.error: {},
+            KBMode.search: {},
+            KBMode.reverse_search: {},
+        },
+        custom_kb_maps={KBMode.normal: {"hello": [{"keys": "j"}]}, KBMode.command: {}},
+        custom_kb_lookup={KBMode.normal: {"hello": hello}, KBMode.command: {}},
+    )
+    binding = kb.get_bindings_for_keys(("j",))[0]
+    assert binding.filter() == False
+
+    kb.activated = True
+    assert binding.filter() == True
+    assert binding.handler(None) is None
+    assert called == [app]
+
+    mocked_forward = mocker.patch.object(FilePane, "forward")
+    binding = kb.get_bindings_for_keys(("l",))[0]
+    await binding.handler(None)
+    mocked_forward.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_async_custom_action(app: App):
+    called = []
+
+    async def hello(app):
+        called.append(app)
+
+    kb = KB(
+        app=app,
+        kb_maps={mode: {} for mode in KBMode},
+        custom_kb_maps={KBMode.normal: {"hello": [{"keys": "j"}]}, KBMode.command: {}},
+        custom_kb_lookup={KBMode.normal: {"hello": hello}, KBMode.command: {}},
+    )
+    binding = kb.get_bindings_for_keys(("j",))[0]
+    await binding.handler(None)
+    assert called == [app]
+
+
+def test_deactivated(mocker: MockerFixture, kb):
+    mocker.patch.object(KeyProcessor, "_start_timeout")
+    called = []
+    fallback = KeyBindings()
+    fallback.add("j")(lambda _: called.append("j"))
+    fallback.add("1")(lambda _: called.append("1"))
+    processor = KeyProcessor(merge_key_bindings([fallback, kb]))
+
+    processor.feed_multiple([KeyPress("j"), KeyPress("1")])
+    processor.process_keys()
+    assert called == []
+    assert kb._action_multiplier is None
+
+    kb.activated = True
+    processor.feed(KeyPress("1"))
+    processor.process_keys()
+    assert called == []
+    assert kb._action_multiplier == 1
+
+
+def test_create_bindings(app: App):
+    kb = KB(
+        app=app,
+        kb_maps={
+            KBMode.normal: {"exit": [{"keys": "c-c"}, {"keys": "q"}]},
+            KBMode.command: {"exit": [{"keys": "c-c", "eager": True}]},
+        },
+    )
+    normal_c, normal_q, command_c = kb.bindings[:3]
+    assert normal_c.handler is normal_q.handler
+    assert normal_c.handler is not command_c.handler
+    assert normal_c.filter is normal_q.filter
+    assert command_c.eager()
+
+
+def test_add_filter(kb):
+    called = []
+
+    @Condition
+    def user_filter():
+        called.append(True)
+        return True
+
+    @kb.add("x", filter=user_filter, mode=KBMode.command)
+    def _(_):
+        pass
+
+    binding = kb.get_bindings_for_keys(("x",))[0]
+    assert binding.filter() == False
+    assert called == []
+
+
+def test_flatten_kb_maps():
+    assert _flatten_kb_maps(
+        {
+            KBMode.normal: {"exit": [{"keys": "c-c"}, {"keys": ["c-w", "q"]}]},
+            KBMode.command: {"exit": [{"keys": "escape", "eager": True}]},
+        }
+    ) == (
+        (KBMode.normal, "exit", ("c-c",), ALWAYS, False),
+        (KBMode.normal, "exit", ("c-w", "q"), ALWAYS, False),
+        (KBMode.command, "exit", ("escape",), ALWAYS, True),
+    )
 
 
 def test_set_action_multiplier(kb):
@@ -52,15 +176,18 @@ def test_set_action_multiplier(kb):
     kb._pane_set_action_multiplier(mocked_event)
     assert kb._action_multiplier == 11
 
+    for _ in range(5):
+        kb._pane_set_action_multiplier(mocked_event)
+    assert kb._action_multiplier == MAX_ACTION_MULTIPLIER
 
-def test_swap_pane(mocker: MockerFixture, kb):
-    mocked_swap = mocker.patch.object(App, "pane_swap")
-
-    kb._swap_pane(Direction.left)
-    mocked_swap.assert_called_with(Direction.left, layout=LayoutMode.vertical)
 
-    kb._swap_pane(Direction.down)
-    mocked_swap.assert_called_with(Direction.down, layout=LayoutMode.horizontal)
+def test_swap_pane(kb, app: App):
+    swap_left = kb._kb_lookup[KBMode.normal, "pane_swap_left"]
+    assert swap_left.func == app.pane_swap
+    assert swap_left.args == (Direction.left, LayoutMode.vertical)
+    swap_down = kb._kb_lookup[KBMode.normal, "pane_swap_down"]
+    assert swap_down.func == app.pane_swap
+    assert swap_down.args == (Direction.down, LayoutMode.horizontal)
 
 
 def test_scroll_down(mocker: MockerFixture, kb):
@@ -1,13 +1,26 @@
+import asyncio
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+
 import pytest
 from prompt_toolkit.application.application import Application
 from prompt_toolkit.layout.containers import FloatContainer, VSplit
 from prompt_toolkit.widgets.base import Frame
 from pytest_mock.plugin import MockerFixture
 
+from s3fm.api.config import Config
+from s3fm.api.fs import S3
 from s3fm.api.history import History
 from s3fm.api.kb import KB
-from s3fm.app import App
-from s3fm.enums import Direction, ErrorType, LayoutMode, Pane, PaneMode
+from s3fm.app import (
+    _SWAP_FOCUS,
+    _SWAP_NOOP,
+    _SWAP_PANES,
+    _SWAP_TABLE,
+    REDRAW_INTERVAL,
+    App,
+)
+from s3fm.enums import Direction, ErrorType, KBMode, LayoutMode, Pane, PaneMode
 from s3fm.exceptions import Bug, Notification
 from s3fm.ui.filepane import FilePane
 
@@ -15,11 +28,14 @@ from s3fm.ui.filepane import FilePane
 class TestAppLayout:
     def test_vertical_layout(self, app, mocker: MockerFixture):
         assert app._layout_mode == LayoutMode.vertical
+        app._layouts.clear()
         spy = mocker.spy(VSplit, "__init__")
         layout = app.layout
         assert isinstance(layout.container, FloatContainer) == True
         assert spy.call_count == 1
         assert len(layout.container.content.children) == 2
+        assert app.layout is layout
+        assert spy.call_count == 1
 
     def test_horizontal_layout(self, app, mocker: MockerFixture):
         app._layout_mode = LayoutMode.horizontal
@@ -45,16 +61,37 @@ class TestAppLayout:
         app.layout
         spy.assert_called_once()
 
+    def test_pane_swapped_layout(self, app):
+        layout = app.layout
+        app._left_pane, app._right_pane = app._right_pane, app._left_pane
+        swapped_layout = app.layout
+        assert swapped_layout is not layout
+        app._left_pane, app._right_pane = app._right_pane, app._left_pane
+        assert app.layout is layout
+
+    def test_shared_floats(self, app):
+        layout = app.layout
+        app._layout_mode = LayoutMode.horizontal
+        assert app.layout.container.floats is layout.container.floats
+
     def test_exception(self, app):
         app._layout_mode = 5
         app.layout
         assert app._layout_mode == LayoutMode.vertical
 
 
+def test_style(app):
+    assert App()._style is app._style
+    config = Config()
+    config.style.clear()
+    assert App(config=config)._style is not app._style
+
+
 def test_redraw(app, mocker: MockerFixture):
     spy = mocker.spy(Application, "invalidate")
     app.redraw()
     spy.assert_called_once()
+    assert app._app.min_redraw_interval == REDRAW_INTERVAL
 
 
 @pytest.mark.asyncio
@@ -88,7 +125,7 @@ async def test_render_task(app, mocker: MockerFixture):
 @pytest.mark.asyncio
 async def test_after_render(app, mocker: MockerFixture):
     stub = mocker.stub("app")
-    app._custom_effects = [stub]
+    app._custom_effects = [(stub, None)]
     task = mocker.patch.object(App, "_render_task")
     mocker.patch.object(FilePane, "loading")
     app._rendered = False
@@ -98,13 +135,108 @@ async def test_after_render(app, mocker: MockerFixture):
     app._after_render(None)
     task.assert_not_called()
     stub.assert_called_with(app)
+    assert app._after_render not in app._app.after_render._handlers
+    assert app._run_effects in app._app.after_render._handlers
+
+
+@pytest.mark.asyncio
+async def test_after_render_deps(app, mocker: MockerFixture):
+    stub = mocker.stub("app")
+    app._custom_effects = [(stub, ("_layout_mode", "_filepane_focus"))]
+    mocker.patch.object(App, "_render_task")
+    mocker.patch.object(FilePane, "loading")
+    app._after_render(None)
+    app._after_render(None)
+    stub.assert_called_once_with(app)
+
+    stub.reset_mock()
+    app._layout_mode = LayoutMode.horizontal
+    app._after_render(None)
+    app._after_render(None)
+    stub.assert_called_once_with(app)
+
+    stub.reset_mock()
+    app._filepane_focus = Pane.right
+    app._after_render(None)
+    stub.assert_called_once_with(app)
+
+
+def test_custom_effects(app):
+    def hello(app):
+        pass
+
+    def world(app):
+        pass
+
+    config = Config()
+    config.app.use_effect(hello)
+    config.app.use_effect(world, deps=("current_filepane", "file_pane_focus", "layout"))
+    assert App(config=config)._custom_effects == (
+        (hello, None),
+        (world, ("_filepane_focus", "_layout_mode")),
+    )
+
+
+@pytest.mark.asyncio
+async def test_after_render_no_effects(app, mocker: MockerFixture):
+    task = mocker.patch.object(App, "_render_task")
+    mocker.patch.object(FilePane, "loading")
+    assert app._custom_effects == ()
+    app._after_render(None)
+    task.assert_called_once()
+    assert app._after_render not in app._app.after_render._handlers
+    assert app._run_effects not in app._app.after_render._handlers
 
 
 @pytest.mark.asyncio
 async def test_run(app, mocker: MockerFixture):
-    mock_run = mocker.patch.object(Application, "run_async")
+    async def run_async():
+        await app._warmup
+
+    mock_run = mocker.patch.object(Application, "run_async", side_effect=run_async)
+    mock_warmup = mocker.patch.object(S3, "warmup")
+    mock_read = mocker.patch.object(History, "read")
+    mocker.patch.object(App, "_load_pane_data")
+    mock_executor = mocker.patch.object(
+        asyncio.get_running_loop(), "set_default_executor"
+    )
     await app.run()
     mock_run.assert_called_once()
+    executor = mock_executor.call_args[0][0]
+    assert isinstance(executor, ThreadPoolExecutor)
+    assert executor._max_workers == 32
+    assert executor._shutdown
+    mock_warmup.assert_called_once()
+    mock_read.assert_called_once()
+    await app._render_task()
+    mock_read.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_run_write_history(app, mocker: MockerFixture):
+    mocker.patch.object(Application, "run_async")
+    mocker.patch.object(S3, "warmup")
+    mocker.patch.object(History, "read")
+    mocked_write = mocker.patch.object(History, "write")
+    mock_executor = mocker.patch.object(
+        asyncio.get_running_loop(), "set_default_executor"
+    )
+    app._no_history = True
+    await app.run()
+    mocked_write.assert_not_called()
+
+    app._no_history = False
+    await app.run()
+    mocked_write.assert_called_once()
+
+    mocked_write.reset_mock()
+    mocker.patch.object(Application, "run_async", side_effect=RuntimeError)
+    with pytest.raises(RuntimeError):
+        await app.run()
+    mocked_write.assert_called_once()
+    assert mock_executor.call_args[0][0]._shutdown
+    for call in mock_executor.call_args_list:
+        call[0][0].shutdown()
 
 
 class TestFocus:
@@ -176,15 +308,28 @@ class TestFocus:
 
 
 def test_exit(app, mocker: MockerFixture):
-    mocker.patch.object(Application, "exit")
+    mocked_exit = mocker.patch.object(Application, "exit")
     mocked_hist = mocker.patch.object(History, "write")
-    app._no_history = True
+    app._left_pane.selected_file_index = 2
     app.exit()
+    mocked_exit.assert_called_once()
     mocked_hist.assert_not_called()
+    assert app._history.left_index == 2
 
-    app._no_history = False
+
+def test_shutdown_executor(app, mocker: MockerFixture):
+    mocker.patch.object(Application, "exit")
+    mocked_cancel = mocker.patch.object(FilePane, "cancel_prefetch")
+    app._executor = mocker.Mock()
+    app._warmup = mocker.Mock()
     app.exit()
-    mocked_hist.assert_called_once()
+    app._executor.shutdown.assert_not_called()
+
+    app._shutdown_executor()
+    assert mocked_cancel.call_count == 2
+    app._warmup.cancel.assert_called_once()
+    app._executor.shutdown.assert_called_once()
+    assert app._executor.shutdown.call_args[1]["wait"] == False
 
 
 def test_layout_switch(app, mocker: MockerFixture):
@@ -197,111 +342,131 @@ def test_layout_switch(app, mocker: MockerFixture):
     mocked_focus.assert_called_once()
     assert app._layout_mode == LayoutMode.vertical
 
+    mocked_focus.reset_mock()
+    app.layout_switch(LayoutMode.vertical)
+    mocked_focus.assert_not_called()
+
 
 class TestPaneSwap:
     def test_single(self, app, mocker: MockerFixture):
-        mocked_focus1 = mocker.patch.object(App, "pane_focus")
-        mocked_focus2 = mocker.patch.object(App, "pane_focus_other")
+        mocked_focus = mocker.patch.object(App, "_focus_filepane")
         app._layout_mode = LayoutMode.single
         app.pane_swap(Direction.left, LayoutMode.vertical)
-        mocked_focus1.assert_not_called()
-        mocked_focus2.assert_not_called()
+        mocked_focus.assert_not_called()
 
     def test_no_swap_right(self, app, mocker: MockerFixture):
-        mocked_focus1 = mocker.patch.object(App, "pane_focus")
-        mocked_focus2 = mocker.patch.object(App, "pane_focus_other")
+        mocked_focus = mocker.patch.object(App, "_focus_filepane")
         app._current_focus = Pane.right
         app._layout_mode = LayoutMode.vertical
         app.pane_swap(Direction.right, LayoutMode.vertical)
-        mocked_focus1.assert_not_called()
-        mocked_focus2.assert_not_called()
+        mocked_focus.assert_not_called()
 
         app._layout_mode = LayoutMode.horizontal
         app.pane_swap(Direction.down, LayoutMode.horizontal)
-        mocked_focus1.assert_not_called()
-        mocked_focus2.assert_not_called()
+        mocked_focus.assert_not_called()
 
     def test_no_swap_left(self, app, mocker: MockerFixture):
-        mocked_focus1 = mocker.patch.object(App, "pane_focus")
-        mocked_focus2 = mocker.patch.object(App, "pane_focus_other")
+        mocked_focus = mocker.patch.object(App, "_focus_filepane")
         app._current_focus = Pane.left
         app._layout_mode = LayoutMode.vertical
         app.pane_swap(Direction.left, LayoutMode.vertical)
-        mocked_focus1.assert_not_called()
-        mocked_focus2.assert_not_called()
+        mocked_focus.assert_not_called()
 
         app._layout_mode = LayoutMode.horizontal
         app.pane_swap(Direction.up, LayoutMode.horizontal)
-        mocked_focus1.assert_not_called()
-        mocked_focus2.assert_not_called()
+        mocked_focus.assert_not_called()
 
     def test_swap_left_swapped(self, app, mocker: MockerFixture):
-        mocked_focus1 = mocker.patch.object(App, "pane_focus")
-        mocked_focus2 = mocker.patch.object(App, "pane_focus_other")
+        mocked_focus = mocker.patch.object(App, "_focus_filepane")
+        right_pane = app._right_pane
         app._current_focus = Pane.right
         assert app._current_focus == Pane.right
         assert app._layout_mode == LayoutMode.vertical
         app.pane_swap(Direction.left, LayoutMode.vertical)
-        mocked_focus2.assert_called_once()
-        mocked_focus1.assert_not_called()
+        mocked_focus.assert_called_once_with(Pane.left, right_pane)
+        assert app._left_pane is right_pane
 
-        mocked_focus1.reset_mock()
-        mocked_focus2.reset_mock()
+        mocked_focus.reset_mock()
         app._current_focus = Pane.right
         app.pane_swap(Direction.left, LayoutMode.horizontal)
-        mocked_focus2.assert_called_once()
-        mocked_focus1.assert_not_called()
+        mocked_focus.assert_called_once_with(Pane.left, app._left_pane)
+        assert app._layout_mode == LayoutMode.horizontal
 
     def test_swap_right_swapped(self, app, mocker: MockerFixture):
-        mocked_focus1 = mocker.patch.object(App, "pane_focus")
-        mocked_focus2 = mocker.patch.object(App, "pane_focus_other")
+        mocked_focus = mocker.patch.object(App, "_focus_filepane")
+        left_pane = app._left_pane
         assert app._current_focus == Pane.left
         assert app._layout_mode == LayoutMode.vertical
         app.pane_swap(Direction.right, LayoutMode.vertical)
-        mocked_focus2.assert_called_once()
-        mocked_focus1.assert_not_called()
+        mocked_focus.assert_called_once_with(Pane.right, left_pane)
+        assert app._right_pane is left_pane
 
         app._current_focus = Pane.left
-        mocked_focus1.reset_mock()
-        mocked_focus2.reset_mock()
+        mocked_focus.reset_mock()
         app.pane_swap(Direction.right, LayoutMode.horizontal)
-        mocked_focus2.assert_called_once()
-        mocked_focus1.assert_not_called()
+        mocked_focus.assert_called_once_with(Pane.right, app._right_pane)
 
     def test_swap_left_noswap(self, app, mocker: MockerFixture):
-        mocked_focus1 = mocker.patch.object(App, "pane_focus")
-        mocked_focus2 = mocker.patch.object(App, "pane_focus_other")
+        mocked_focus = mocker.patch.object(App, "_focus_filepane")
+        left_pane = app._left_pane
         assert app._current_focus == Pane.left
         assert app._layout_mode == LayoutMode.vertical
         app.pane_swap(Direction.left, LayoutMode.horizontal)
-        mocked_focus1.assert_called_once()
-        mocked_focus2.assert_not_called()
+        mocked_focus.assert_called_once_with(Pane.left, left_pane)
+        assert app._left_pane is left_pane
 
-        mocked_focus1.reset_mock()
-        mocked_focus2.reset_mock()
+        mocked_focus.reset_mock()
         app._current_focus = Pane.left
         app._layout_mode = LayoutMode.horizontal
         app.pane_swap(Direction.left, LayoutMode.vertical)
-        mocked_focus1.assert_called_once()
-        mocked_focus2.assert_not_called()
+        mocked_focus.assert_called_once_with(Pane.left, left_pane)
 
     def test_swap_right_noswap(self, app, mocker: MockerFixture):
-        mocked_focus1 = mocker.patch.object(App, "pane_focus")
-        mocked_focus2 = mocker.patch.object(App, "pane_focus_other")
+        mocked_focus = mocker.patch.object(App, "_focus_filepane")
+        right_pane = app._right_pane
         app._current_focus = Pane.right
         assert app._current_focus == Pane.right
         assert app._layout_mode == LayoutMode.vertical
         app.pane_swap(Direction.right, LayoutMode.horizontal)
-        mocked_focus1.assert_called_once()
-        mocked_focus2.assert_not_called()
+        mocked_focus.assert_called_once_with(Pane.right, right_pane)
+        assert app._right_pane is right_pane
 
-        mocked_focus1.reset_mock()
-        mocked_focus2.reset_mock()
+        mocked_focus.reset_mock()
         app._current_focus = Pane.right
         app._layout_mode = LayoutMode.horizontal
         app.pane_swap(Direction.right, LayoutMode.vertical)
-        mocked_focus1.assert_called_once()
-        mocked_focus2.assert_not_called()
+        mocked_focus.assert_called_once_with(Pane.right, right_pane)
+
+    def test_swap_table(self):
+        for focus, direction, current, target in itertools.product(
+            (Pane.left, Pane.right), Direction, LayoutMode, LayoutMode
+        ):
+            towards = (
+                focus == Pane.right
+                and (direction == Direction.right or direction == Direction.down)
+            ) or (
+                focus == Pane.left
+                and (direction == Direction.left or direction == Direction.up)
+            )
+            if towards and current == target:
+                expected = _SWAP_NOOP
+            elif towards:
+                expected = _SWAP_FOCUS
+            else:
+                expected = _SWAP_PANES
+            assert _SWAP_TABLE[focus, direction, current, target] == expected
+        assert len(_SWAP_TABLE) == 2 * len(Direction) * len(LayoutMode) ** 2
+
+    def test_focus_filepane(self, app, mocker: MockerFixture):
+        mocked_focus = mocker.patch("prompt_toolkit.layout.Layout.focus")
+        app._kb_mode = KBMode.command
+        app._current_focus = Pane.cmd
+        app._focus_filepane(Pane.right, app._right_pane)
+        assert app._kb_mode == KBMode.normal
+        assert app._filepane_focus == Pane.right
+        assert app._previous_focus == Pane.cmd
+        assert app._current_focus == Pane.right
+        mocked_focus.assert_called_once_with(app._right_pane)
 
 
 def test_property_pane(app):
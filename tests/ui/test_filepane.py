@@ -1,10 +1,11 @@
+import asyncio
 from pathlib import Path
 
 import pytest
 from prompt_toolkit.layout.dimension import LayoutDimension
 from pytest_mock.plugin import MockerFixture
 
-from s3fm.api.fs import File
+from s3fm.api.fs import S3, File
 from s3fm.app import App
 from s3fm.enums import FileType, Pane, PaneMode
 from s3fm.exceptions import Bug, ClientError
@@ -17,8 +18,7 @@ async def patched_app(app: App, mocker: MockerFixture):
     mocked_height = mocker.patch.object(FilePane, "_get_height")
     mocked_height.return_value = 5
     app._left_pane._files = [
-        File(name="%s" % i, type=i, info="", hidden=False, raw=Path(), index=i)
-        for i in range(6)
+        File(name="%s" % i, type=i, info="", raw=Path(), index=i) for i in range(6)
     ]
     await app._left_pane.filter_files()
     yield app
@@ -179,7 +179,6 @@ class TestGetFormattedFiles:
                 name="hello",
                 type=FileType.dir,
                 info="",
-                hidden=False,
                 raw=Path(),
                 index=0,
             )
@@ -239,50 +238,106 @@ class TestGetFormattedFiles:
         assert patched_app._left_pane._last_line == 5
 
 
+@pytest.mark.asyncio
+async def test_prefetch_selection(app: App, mocker: MockerFixture):
+    mocker.patch("s3fm.ui.filepane.PREFETCH_DELAY", 0)
+    mocked_prefetch = mocker.patch.object(S3, "prefetch")
+    pane = app._left_pane
+    pane._loaded = True
+    pane.path = "bucket1"
+    pane._files = [
+        File(name="..", type=FileType.dir, info="", raw=None, index=0),
+        File(name="dir1/", type=FileType.dir, info="", raw=None, index=1),
+        File(name="dir2/", type=FileType.dir, info="", raw=None, index=2),
+        File(name="file1", type=FileType.file, info="", raw=None, index=3),
+    ]
+    await pane.filter_files()
+
+    pane.scroll_down(value=3)
+    pane.selected_file_index = 1
+    pane._get_formatted_files()
+    await asyncio.sleep(0.01)
+    mocked_prefetch.assert_not_called()
+
+    pane.scroll_down()
+    pane.scroll_up()
+    pane.page_down()
+    await asyncio.sleep(0.01)
+    mocked_prefetch.assert_called_once_with("dir2/", Path("bucket1"))
+
+    mocked_prefetch.reset_mock()
+    pane.scroll_up()
+    pane.path = "bucket2"
+    await asyncio.sleep(0.01)
+    mocked_prefetch.assert_called_once_with("dir1/", Path("bucket1"))
+
+    mocked_prefetch.reset_mock()
+    pane.scroll_down()
+    pane.cancel_prefetch()
+    await asyncio.sleep(0.01)
+    mocked_prefetch.assert_not_called()
+
+    pane.mode = PaneMode.fs
+    pane.scroll_up()
+    await asyncio.sleep(0.01)
+    mocked_prefetch.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_prefetch_forward(app: App, mocker: MockerFixture):
+    mocker.patch("s3fm.ui.filepane.PREFETCH_DELAY", 0)
+    mocked_prefetch = mocker.patch.object(S3, "prefetch")
+    mocker.patch.object(
+        S3,
+        "cd",
+        return_value=[
+            File(name="dir3/", type=FileType.dir, info="", raw=None, index=0)
+        ],
+    )
+    pane = app._left_pane
+    pane._loaded = True
+    pane.path = "bucket1"
+    pane._files = [File(name="dir1/", type=FileType.dir, info="", raw=None, index=0)]
+    await pane.filter_files()
+
+    pane.scroll_up()
+    await pane.forward()
+    await asyncio.sleep(0.01)
+    mocked_prefetch.assert_called_once_with("dir3/", Path("bucket1"))
+
+
 class TestGetFileInfo:
     def test_file(self, app: App):
-        assert (
-            app._left_pane._get_file_info(
-                File(
-                    name="Hello",
-                    type=FileType.file,
-                    info="",
-                    hidden=False,
-                    index=0,
-                    raw=None,
-                )
+        assert app._left_pane._get_file_info(
+            File(
+                name="Hello",
+                type=FileType.file,
+                info="",
+                index=0,
+                raw=None,
             )
-            == ("class:filepane.file", " \uf4a5 ", "Hello", "")
-        )
+        ) == ("class:filepane.file", " \uf4a5 ", "Hello", "")
 
-        assert (
-            app._left_pane._get_file_info(
-                File(
-                    name="Hello.js",
-                    type=FileType.file,
-                    info="",
-                    hidden=False,
-                    index=0,
-                    raw=None,
-                )
+        assert app._left_pane._get_file_info(
+            File(
+                name="Hello.js",
+                type=FileType.file,
+                info="",
+                index=0,
+                raw=None,
             )
-            == ("class:filepane.file", " \ue60c ", "Hello.js", "")
-        )
+        ) == ("class:filepane.file", " \ue60c ", "Hello.js", "")
 
     def test_dir(self, app: App):
-        assert (
-            app._left_pane._get_file_info(
-                File(
-                    name="Downloads",
-                    type=FileType.file,
-                    info="",
-                    hidden=False,
-                    index=0,
-                    raw=None,
-                )
+        assert app._left_pane._get_file_info(
+            File(
+                name="Downloads",
+                type=FileType.file,
+                info="",
+                index=0,
+                raw=None,
             )
-            == ("class:filepane.file", " \uf74c ", "Downloads", "")
-        )
+        ) == ("class:filepane.file", " \uf74c ", "Downloads", "")
 
     def test_line_process_bug(self, app: App):
         @app._left_pane._linemode.register
@@ -295,7 +350,6 @@ class TestGetFileInfo:
                     name="Downloads",
                     type=FileType.link,
                     info="",
-                    hidden=False,
                     index=0,
                     raw=None,
                 )
@@ -310,19 +364,15 @@ class TestGetFileInfo:
         def _(file):
             return ("class:filepane.file", "   ", file.name, file.info)
 
-        assert (
-            app._left_pane._get_file_info(
-                File(
-                    name="Downloads",
-                    type=FileType.file,
-                    info="",
-                    hidden=False,
-                    index=0,
-                    raw=None,
-                )
+        assert app._left_pane._get_file_info(
+            File(
+                name="Downloads",
+                type=FileType.file,
+                info="",
+                index=0,
+                raw=None,
             )
-            == ("class:filepane.file", "   ", "Downloads", "")
-        )
+        ) == ("class:filepane.file", "   ", "Downloads", "")
 
 
 def test_get_width_dimension(app: App, mocker: MockerFixture):
@@ -455,8 +505,7 @@ class TestForward:
     async def test_fs_forward(self, patched_app: App, mocker: MockerFixture):
         mocked_cd = mocker.patch("s3fm.api.fs.FS.cd")
         mocked_cd.return_value = [
-            File(name="%s" % i, type=i, info="", hidden=False, raw=Path(), index=i)
-            for i in range(2)
+            File(name="%s" % i, type=i, info="", raw=Path(), index=i) for i in range(2)
         ]
         patched_app._left_pane._mode = PaneMode.fs
         await patched_app._left_pane.forward()
@@ -472,8 +521,7 @@ class TestForward:
     async def test_s3_forward(self, patched_app: App, mocker: MockerFixture):
         mocked_cd = mocker.patch("s3fm.api.fs.S3.cd")
         mocked_cd.return_value = [
-            File(name="%s" % i, type=i, info="", hidden=False, raw=Path(), index=i)
-            for i in range(2)
+            File(name="%s" % i, type=i, info="", raw=Path(), index=i) for i in range(2)
         ]
         assert patched_app._left_pane._mode == PaneMode.s3
         assert patched_app._left_pane.file_count == 6
@@ -500,8 +548,7 @@ class TestBackword:
     async def test_fs_backword(self, app: App, mocker: MockerFixture):
         mocked_cd = mocker.patch("s3fm.api.fs.FS.cd")
         mocked_cd.return_value = [
-            File(name="%s" % i, type=i, info="", hidden=False, raw=Path(), index=i)
-            for i in range(2)
+            File(name="%s" % i, type=i, info="", raw=Path(), index=i) for i in range(2)
         ]
         app._left_pane._mode = PaneMode.fs
         assert app._left_pane.file_count == 0
@@ -513,8 +560,7 @@ class TestBackword:
     async def test_s3_backword(self, app: App, mocker: MockerFixture):
         mocked_cd = mocker.patch("s3fm.api.fs.S3.cd")
         mocked_cd.return_value = [
-            File(name="%s" % i, type=i, info="", hidden=False, raw=Path(), index=i)
-            for i in range(2)
+            File(name="%s" % i, type=i, info="", raw=Path(), index=i) for i in range(2)
         ]
         assert app._left_pane._mode == PaneMode.s3
         assert app._left_pane.file_count == 0
@@ -534,7 +580,13 @@ class TestBackword:
 @pytest.mark.asyncio
 async def test_fileter_files(app: App):
     app._left_pane._files = [
-        File(name="%s" % i, type=i, info="", hidden=bool(i % 2), raw=Path(), index=i)
+        File(
+            name="%s%s" % ("." if i % 2 else "", i),
+            type=i,
+            info="",
+            raw=Path(),
+            index=i,
+        )
         for i in range(6)
     ]
     await app._left_pane.filter_files()
@@ -543,6 +595,17 @@ async def test_fileter_files(app: App):
     app._left_pane._display_hidden = False
     await app._left_pane.filter_files()
     assert app._left_pane.file_count == 3
+    visible_files = app._left_pane._filtered_files
+
+    app._left_pane._display_hidden = True
+    await app._left_pane.filter_files()
+    app._left_pane._display_hidden = False
+    await app._left_pane.filter_files()
+    assert app._left_pane._filtered_files is visible_files
+
+    app._left_pane._files = app._left_pane._files[:2]
+    await app._left_pane.filter_files()
+    assert app._left_pane.file_count == 1
 
 
 class TestLoadData:
@@ -550,8 +613,7 @@ class TestLoadData:
     async def test_s3(self, app: App, mocker: MockerFixture):
         mocked_s3 = mocker.patch("s3fm.api.fs.S3.get_paths")
         mocked_s3.return_value = [
-            File(name="%s" % i, type=i, info="", hidden=False, raw=Path(), index=i)
-            for i in range(6)
+            File(name="%s" % i, type=i, info="", raw=Path(), index=i) for i in range(6)
         ]
         assert app._left_pane._mode == PaneMode.s3
         assert app._left_pane.file_count == 0
@@ -568,8 +630,7 @@ class TestLoadData:
     async def test_fs(self, app: App, mocker: MockerFixture):
         mocked_fs = mocker.patch("s3fm.api.fs.FS.get_paths")
         mocked_fs.return_value = [
-            File(name="%s" % i, type=i, info="", hidden=False, raw=Path(), index=i)
-            for i in range(6)
+            File(name="%s" % i, type=i, info="", raw=Path(), index=i) for i in range(6)
         ]
         app._left_pane._mode = PaneMode.fs
         assert app._left_pane.file_count == 0
@@ -606,10 +667,34 @@ def test_path_property(app: App, mocker: MockerFixture):
 
 
 @pytest.mark.asyncio
-async def test_toggle_hidden_files(app):
+async def test_toggle_hidden_files(app, mocker: MockerFixture):
+    mocked_filter = mocker.patch.object(FilePane, "filter_files")
     assert app.current_filepane.display_hidden_files == True
     await app.current_filepane.pane_toggle_hidden_files(False)
     assert app.current_filepane.display_hidden_files == False
+    mocked_filter.assert_called_once()
+
+    mocked_filter.reset_mock()
+    await app.current_filepane.pane_toggle_hidden_files(False)
+    assert app.current_filepane.display_hidden_files == False
+    mocked_filter.assert_not_called()
+
+    await app.current_filepane.pane_toggle_hidden_files()
+    assert app.current_filepane.display_hidden_files == True
+    mocked_filter.assert_called_once()
+
+
+def test_apply_history_state(app: App):
+    pane = app._left_pane
+    pane.apply_history_state(PaneMode.fs, 2, str(Path.home()))
+    assert pane.mode == PaneMode.fs
+    assert pane.selected_file_index == 2
+    assert pane.path == str(Path.home())
+
+    pane.apply_history_state(PaneMode.s3, 1, "bucket1/hello")
+    assert pane.mode == PaneMode.s3
+    assert pane.selected_file_index == 1
+    assert pane.path == "bucket1/hello"
 
 
 @pytest.mark.asyncio